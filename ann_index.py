@@ -0,0 +1,200 @@
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.cluster import MiniBatchKMeans
+
+from embeddings import EMBEDDING_DIR, text_keys
+from clustering import make_svd
+
+# -----------------------------
+# Recherche approchée des plus proches voisins (IVF)
+# -----------------------------
+# Index à listes inversées sur les vecteurs normalisés (similarité cosinus) :
+# un k-means grossier répartit les vecteurs en NLIST listes, rangées de
+# façon contiguë. Une requête n'examine que les `nprobe` listes dont le
+# centroïde est le plus proche, puis trie exactement ces candidats.
+#
+# Les vecteurs TF-IDF (creux) sont d'abord projetés par SVD tronquée. Un
+# index est enregistré par exécution de clustering (clé de jobs.py), à côté
+# des vecteurs Sentence-BERT : la recherche porte sur les textes et le
+# pipeline du résultat affiché, même si d'autres textes ont été regroupés
+# depuis avec les mêmes paramètres. Les tableaux sont relus en np.memmap.
+
+ANN_DIR = os.path.join(EMBEDDING_DIR, "ann")
+ANN_COMPONENTS = 128
+NPROBE = 8
+# En dessous, une seule liste : la recherche est exacte
+MIN_ROWS_PER_LIST = 256
+MAX_CACHED_INDEXES = 4
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def texts_fingerprint(texts):
+    return hashlib.blake2b(text_keys(texts).tobytes(), digest_size=16).hexdigest()
+
+
+class IVFIndex:
+    def __init__(self, centroids, offsets, ids, vectors, projection=None, table=None, fingerprint=None):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.vectors = vectors
+        self.projection = projection
+        # Une ligne par vecteur indexé (texte, cluster, effectif...)
+        self.table = table
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, vectors, table=None, fingerprint=None, seed=42):
+        projection = None
+        if sp.issparse(vectors):
+            projection = make_svd(vectors, ANN_COMPONENTS)
+            vectors = projection.fit_transform(vectors)
+        vectors = _normalize(vectors)
+
+        n = len(vectors)
+        nlist = max(1, min(int(4 * np.sqrt(n)), n // MIN_ROWS_PER_LIST))
+        if nlist == 1:
+            assignment = np.zeros(n, dtype=np.int64)
+            centroids = _normalize(vectors.mean(axis=0, keepdims=True)) if n else np.zeros((1, vectors.shape[1]), np.float32)
+        else:
+            quantizer = MiniBatchKMeans(n_clusters=nlist, batch_size=4096, n_init=1, random_state=seed)
+            quantizer.fit(vectors)
+            centroids = _normalize(quantizer.cluster_centers_)
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+
+        ids = np.argsort(assignment, kind='stable')
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignment, minlength=nlist))
+        return cls(centroids, offsets, ids, vectors[ids], projection, table, fingerprint)
+
+    def transform(self, queries):
+        if self.projection is not None:
+            queries = self.projection.transform(queries)
+        elif sp.issparse(queries):
+            queries = queries.toarray()
+        return _normalize(queries)
+
+    def search(self, query, k=10, nprobe=NPROBE):
+        # `query` : vecteur (ou matrice d'une ligne) issu du même pipeline ;
+        # retourne (positions dans `table`, similarités cosinus)
+        q = self.transform(query)[0]
+        nlist = len(self.centroids)
+        nprobe = min(nprobe, nlist)
+        closest = np.sort(np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe])
+        ranges = [np.arange(self.offsets[c], self.offsets[c + 1]) for c in closest]
+        candidates = np.concatenate(ranges) if ranges else np.zeros(0, dtype=np.int64)
+        if len(candidates) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        scores = np.asarray(self.vectors[candidates] @ q)
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return self.ids[candidates[top]], scores[top]
+
+    # --- persistance ---
+    def save(self, path):
+        tmp_path = os.path.join(os.path.dirname(path), ".tmp-" + os.path.basename(path))
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        try:
+            for name in ('centroids', 'offsets', 'ids', 'vectors'):
+                np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, name))
+            joblib.dump({'projection': self.projection, 'fingerprint': self.fingerprint}, os.path.join(tmp_path, "meta.joblib"))
+            if self.table is not None:
+                self.table.to_parquet(os.path.join(tmp_path, "table.parquet"), index=False)
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp_path, path)
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path):
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+            for name in ('centroids', 'offsets', 'ids', 'vectors')
+        }
+        meta = joblib.load(os.path.join(path, "meta.joblib"))
+        table_path = os.path.join(path, "table.parquet")
+        table = pd.read_parquet(table_path) if os.path.exists(table_path) else None
+        return cls(
+            np.asarray(arrays['centroids']), np.asarray(arrays['offsets']), arrays['ids'], arrays['vectors'],
+            meta['projection'], table, meta['fingerprint'],
+        )
+
+
+def index_path(name):
+    return os.path.join(ANN_DIR, name)
+
+
+def _stamp(path):
+    # Date d'écriture de l'index (réécrit en bloc, voir IVFIndex.save)
+    try:
+        return os.stat(os.path.join(path, "meta.joblib")).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _remember(path, stamp, index):
+    with _lock:
+        _indexes[path] = (stamp, index)
+        _indexes.move_to_end(path)
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+
+
+def load_index(name):
+    # Index enregistré sous `name`, None s'il n'existe pas
+    path = index_path(name)
+    stamp = _stamp(path)
+    if stamp is None:
+        return None
+    with _lock:
+        entry = _indexes.get(path)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+    try:
+        index = IVFIndex.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    _remember(path, stamp, index)
+    return index
+
+
+def index_for(model, texts, table, name):
+    # Index des `texts` (vectorisés par le pipeline `model`) enregistré sous
+    # `name`, reconstruit seulement si les textes ou le pipeline ont changé
+    fingerprint = f"{model.fit_id}-{texts_fingerprint(texts)}"
+    index = load_index(name)
+    if index is not None and index.fingerprint == fingerprint:
+        return index
+
+    index = IVFIndex.build(model.vectorize(texts), table=table, fingerprint=fingerprint)
+    os.makedirs(ANN_DIR, exist_ok=True)
+    path = index_path(name)
+    index.save(path)
+    _remember(path, _stamp(path), index)
+    return index
+
+
+def remove_index(name):
+    path = index_path(name)
+    with _lock:
+        _indexes.pop(path, None)
+    shutil.rmtree(path, ignore_errors=True)
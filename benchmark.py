@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+import plotly.express as px
+
+from synthetic import generate_fleet
+from pipeline import process_data
+from filters import FilterEngine
+from cube import MetricsCube, kpis, summarize, totals
+from paging import page
+from charts import box_figure, box_summary
+from export import EXPORT_FORMATS
+
+# -----------------------------
+# Banc d'essai du pipeline des tableaux de bord
+# -----------------------------
+# Génère des parcs synthétiques (graine fixe) de tailles croissantes et
+# mesure chaque étape : durée et pic mémoire (tracemalloc, qui suit les
+# allocations NumPy/pandas). Les résultats sont ajoutés à un fichier JSON
+# lines avec le commit courant, pour comparer deux versions :
+#
+#     python benchmark.py --sizes 10000 100000 1000000 --output bench.jsonl
+#     python benchmark.py --compare avant.jsonl apres.jsonl
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+# Au-delà, l'écriture/lecture xlsx prend trop de temps pour être mesurée
+EXCEL_MAX_ROWS = 100_000
+
+# Filtres représentatifs de la barre latérale
+SELECTED = {'modèle': ['V01', 'VRS'], 'filiale': ['France', 'Germany', 'Spain']}
+CONTAINS = {}
+RANGES = {'nombre_incidents': (1, 10), 'nombre_retours': (0, 5), 'Date de fabrication': ('2018-01-01', '2022-12-31')}
+SERIAL_QUERY = '0119V'
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(fn, repeat=1):
+    # Retourne (résultat, meilleure durée en s, pic mémoire en Mo). Le suivi
+    # tracemalloc ralentit les allocations : le pic est mesuré sur une
+    # exécution séparée des mesures de durée.
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, best, peak / 1024 ** 2
+
+
+def run_size(n_rows, repeat=1, seed=0, workdir=None):
+    raw = generate_fleet(n_rows, seed=seed)
+    stages = []
+
+    def record(stage, fn):
+        result, seconds, peak_mb = measure(fn, repeat)
+        stages.append({'stage': stage, 'seconds': round(seconds, 6), 'peak_mb': round(peak_mb, 3)})
+        return result
+
+    if n_rows <= EXCEL_MAX_ROWS:
+        path = os.path.join(workdir, f"fleet_{n_rows}.xlsx")
+        raw.to_excel(path, index=False)
+        record('excel_read', lambda: pd.read_excel(path))
+
+    df = record('process_data', lambda: process_data(raw.copy()))
+    engine = record('filter_index', lambda: FilterEngine(df))
+    filtered = record('filter_apply', lambda: engine.apply(df, selected=SELECTED, contains=CONTAINS, ranges=RANGES))
+    record('serial_search', lambda: engine.apply(df, contains={'no de série': SERIAL_QUERY}))
+    cube = record('cube_build', lambda: MetricsCube(df))
+    summary = record('kpis_cube', lambda: summarize(cube, engine, filtered, SELECTED, CONTAINS, RANGES))
+    record('kpis', lambda: kpis(summary))
+    # Filtre hors dimensions du cube : agrégation depuis les lignes filtrées
+    record('kpis_raw', lambda: kpis(summarize(cube, engine, filtered, SELECTED, {'no de série': '1'}, RANGES)))
+    record('sort_page', lambda: page(filtered, f'bench-{n_rows}-{time.perf_counter()}', 'nombre_incidents'))
+
+    export_path = os.path.join(workdir, f"export_{n_rows}.csv.gz")
+    record('export_csv_gz', lambda: EXPORT_FORMATS['CSV (gzip)'][2](filtered, export_path))
+
+    record('chart_bar', lambda: px.bar(totals(summary, 'modèle', 'nombre_incidents'), x='modèle', y='nombre_incidents').to_json())
+    record('chart_box', lambda: box_figure(
+        *box_summary(filtered, 'modèle', 'délai_premier_incident'), 'modèle', 'délai_premier_incident'
+    ).to_json())
+    return stages
+
+
+def run(sizes, repeat=1, seed=0, output=None):
+    commit = current_commit()
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_rows in sizes:
+            for stage in run_size(n_rows, repeat, seed, workdir):
+                row = {'commit': commit, 'rows': n_rows, 'seed': seed, **stage}
+                rows.append(row)
+                print(f"{n_rows:>10} {stage['stage']:<15} {stage['seconds']:>10.4f} s {stage['peak_mb']:>10.1f} Mo")
+    if output:
+        with open(output, 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+    return rows
+
+
+def compare(before_path, after_path):
+    before = pd.read_json(before_path, lines=True)
+    after = pd.read_json(after_path, lines=True)
+    keys = ['rows', 'stage']
+    # Dernière mesure de chaque (taille, étape) dans chaque fichier
+    before = before.groupby(keys)[['seconds', 'peak_mb']].last()
+    after = after.groupby(keys)[['seconds', 'peak_mb']].last()
+    table = before.join(after, lsuffix='_avant', rsuffix='_apres', how='inner')
+    table['ratio_temps'] = table['seconds_apres'] / table['seconds_avant']
+    table['ratio_memoire'] = table['peak_mb_apres'] / table['peak_mb_avant']
+    return table.reset_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai du pipeline des tableaux de bord")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Nombres de lignes à générer")
+    parser.add_argument('--repeat', type=int, default=1, help="Répétitions par étape (meilleur temps retenu)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Fichier JSON lines où ajouter les résultats")
+    parser.add_argument('--compare', nargs=2, metavar=('AVANT', 'APRES'), help="Compare deux fichiers de résultats")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with pd.option_context('display.width', 200, 'display.max_rows', None):
+            print(compare(*args.compare).to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+        return 0
+    run(args.sizes, args.repeat, args.seed, args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
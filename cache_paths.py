@@ -0,0 +1,37 @@
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+# -----------------------------
+# Dossier des caches et verrou entre processus
+# -----------------------------
+# Racine commune aux caches du tableau de bord (ingestion, parc enregistré,
+# exports) et du clustering de textes (vecteurs, pipelines, exécutions) :
+# chaque module range ses fichiers dans son propre sous-dossier.
+
+CACHE_ROOT = os.environ.get(
+    "DONNEES_CACHE_ROOT",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"),
+)
+
+
+class FileLock:
+    # Verrou exclusif entre processus (fichier `path`), sans effet sous Windows
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+        return False
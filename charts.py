@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+import plotly.colors as pc
+import plotly.graph_objects as go
+
+# -----------------------------
+# Graphiques à partir de résumés statistiques
+# -----------------------------
+# Les statistiques sont calculées côté serveur (quartiles, moustaches,
+# échantillon borné de valeurs aberrantes, histogrammes pré-calculés,
+# courbes réduites aux points utiles) : la taille du graphique envoyé au
+# navigateur ne dépend plus du nombre de lignes.
+
+MAX_OUTLIERS_PER_GROUP = 50
+WHISKER = 1.5
+
+
+def box_summary(df, by, value, max_outliers=MAX_OUTLIERS_PER_GROUP, seed=0):
+    # Une ligne par groupe : q1, médiane, q3, moustaches, moyenne, effectif.
+    # Retourne aussi un échantillon (au plus `max_outliers` par groupe) des
+    # valeurs hors moustaches.
+    data = df[[by, value]].dropna()
+    data[value] = data[value].astype('float64')
+    if data.empty:
+        # Aucune valeur après filtrage : graphique vide
+        columns = [by, 'q1', 'median', 'q3', 'mean', 'count', 'lowerfence', 'upperfence']
+        return pd.DataFrame(columns=columns), data
+    groups = data.groupby(by, observed=True)[value]
+
+    summary = groups.quantile([0.25, 0.5, 0.75]).unstack()
+    summary.columns = ['q1', 'median', 'q3']
+    summary['mean'] = groups.mean()
+    summary['count'] = groups.size()
+    iqr = summary['q3'] - summary['q1']
+    low_fence = summary['q1'] - WHISKER * iqr
+    high_fence = summary['q3'] + WHISKER * iqr
+
+    # Moustaches : valeurs extrêmes restant dans les bornes de Tukey
+    row_low = data[by].map(low_fence).astype('float64').to_numpy()
+    row_high = data[by].map(high_fence).astype('float64').to_numpy()
+    values = data[value].to_numpy()
+    inside = (values >= row_low) & (values <= row_high)
+    within = data[inside].groupby(by, observed=True)[value]
+    summary['lowerfence'] = within.min()
+    summary['upperfence'] = within.max()
+
+    outliers = data[~inside]
+    if len(outliers):
+        rng = np.random.default_rng(seed)
+        shuffled = outliers.iloc[rng.permutation(len(outliers))]
+        rank = shuffled.groupby(by, observed=True).cumcount().to_numpy()
+        outliers = shuffled[rank < max_outliers]
+    return summary.reset_index(), outliers
+
+
+def box_figure(summary, outliers, by, value, title=None):
+    fig = go.Figure()
+    fig.add_trace(go.Box(
+        x=summary[by].astype(str),
+        q1=summary['q1'],
+        median=summary['median'],
+        q3=summary['q3'],
+        lowerfence=summary['lowerfence'],
+        upperfence=summary['upperfence'],
+        mean=summary['mean'],
+        name=value,
+        boxpoints=False,
+        showlegend=False,
+    ))
+    if len(outliers):
+        fig.add_trace(go.Scatter(
+            x=outliers[by].astype(str),
+            y=outliers[value],
+            mode='markers',
+            marker=dict(size=4, opacity=0.6),
+            name='Valeurs aberrantes (échantillon)',
+            showlegend=False,
+        ))
+    fig.update_layout(title=title, xaxis_title=by, yaxis_title=value)
+    return fig
+
+
+def histogram_bins(values, bins=50, value_range=None):
+    # Histogramme calculé côté serveur : (effectifs, bornes des classes)
+    values = pd.Series(values).dropna().astype('float64').to_numpy()
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(1)
+    return np.histogram(values, bins=bins, range=value_range)
+
+
+def histogram_figure(counts, edges, title=None, xaxis_title=None):
+    centers = (edges[:-1] + edges[1:]) / 2
+    fig = go.Figure(go.Bar(x=centers, y=counts, width=np.diff(edges), marker_line_width=0))
+    fig.update_layout(title=title, xaxis_title=xaxis_title, yaxis_title='Effectif', bargap=0)
+    return fig
+
+
+def survival_figure(curves, by, title=None):
+    # Courbes de Kaplan-Meier en escalier, une trace par cohorte (`curves`
+    # réduit aux points utiles, voir survival.step_points)
+    fig = go.Figure()
+    for name, group in curves.groupby(by, observed=True, sort=True):
+        label = name[0] if isinstance(name, tuple) and len(name) == 1 else name
+        # Départ à 100 % au délai 0
+        x = np.r_[0, group['délai'].to_numpy()]
+        y = np.r_[1.0, group['survie'].to_numpy()]
+        fig.add_trace(go.Scatter(x=x, y=y, mode='lines', line_shape='hv', name=str(label)))
+    fig.update_layout(
+        title=title,
+        xaxis_title='Jours depuis l\'installation',
+        yaxis_title='Part sans incident',
+        yaxis_tickformat='.0%',
+        yaxis_range=[0, 1.02],
+    )
+    return fig
+
+
+def cohort_heatmap(cohorts, rows, columns, value, title=None):
+    # Carte de chaleur d'un indicateur par cohorte (ex. modèle × mois de fabrication)
+    grid = cohorts.pivot_table(index=rows, columns=columns, values=value, observed=True, dropna=False)
+    fig = go.Figure(go.Heatmap(
+        z=grid.to_numpy(),
+        x=[str(c)[:7] for c in grid.columns],
+        y=[str(r) for r in grid.index],
+        colorscale='RdYlGn' if value.startswith('fiabilité') else 'Reds',
+        colorbar=dict(title=value),
+        hoverongaps=False,
+    ))
+    fig.update_layout(title=title, xaxis_title=columns, yaxis_title=rows)
+    return fig
+
+
+# -----------------------------
+# Projection 2D du clustering (voir density.py)
+# -----------------------------
+PALETTES = {
+    'Plotly': pc.qualitative.Plotly,
+    'D3': pc.qualitative.D3,
+    'Set1': pc.qualitative.Set1,
+    'Dark24': pc.qualitative.Dark24,
+    'Alphabet': pc.qualitative.Alphabet,
+}
+NOISE_COLOR = '#9e9e9e'
+
+
+def cluster_colors(clusters, palette='Plotly'):
+    # Une couleur par cluster ; gris pour le bruit (étiquette -1 de HDBSCAN)
+    colors = PALETTES[palette]
+    result = []
+    for i, cluster in enumerate(clusters):
+        result.append(NOISE_COLOR if cluster == -1 else colors[i % len(colors)])
+    return result
+
+
+def density_figure(tiles, clusters, palette='Plotly', title=None):
+    # Tuiles colorées par cluster majoritaire, opacité selon l'effectif
+    # (échelle logarithmique) ; l'image envoyée ne dépend pas du nombre de points
+    colors = np.array([pc.hex_to_rgb(c) if c.startswith('#') else pc.unlabel_rgb(c) for c in cluster_colors(clusters, palette)])
+    total, dominant = tiles['total'], tiles['dominant']
+    image = np.zeros(total.shape + (4,), dtype=np.uint8)
+    filled = dominant >= 0
+    image[filled, :3] = colors[dominant[filled]]
+    peak = np.log1p(total.max()) if total.max() > 0 else 1.0
+    image[filled, 3] = (40 + 215 * np.log1p(total[filled]) / peak).astype(np.uint8)
+
+    (x0, y0), (dx, dy) = tiles['origin'], tiles['step']
+    fig = go.Figure(go.Image(z=image, colormodel='rgba', x0=x0 + dx / 2, y0=y0 + dy / 2, dx=dx, dy=dy, hoverinfo='skip'))
+    # Légende : une trace vide par cluster
+    for cluster, color in zip(clusters, cluster_colors(clusters, palette)):
+        fig.add_trace(go.Scatter(x=[None], y=[None], mode='markers', marker=dict(color=color, size=10), name=str(cluster)))
+    fig.update_layout(title=title, legend_title='Cluster', plot_bgcolor='white')
+    fig.update_yaxes(autorange=True, scaleanchor=None)
+    return fig
+
+
+def points_figure(coords, labels, clusters, palette='Plotly', hover=None, title=None):
+    # Points individuels (zone visible peu peuplée), une trace WebGL par cluster
+    fig = go.Figure()
+    for cluster, color in zip(clusters, cluster_colors(clusters, palette)):
+        mask = labels == cluster
+        if not mask.any():
+            continue
+        fig.add_trace(go.Scattergl(
+            x=coords[mask, 0],
+            y=coords[mask, 1],
+            mode='markers',
+            marker=dict(color=color, size=6 if len(coords) > 1000 else 10),
+            name=str(cluster),
+            text=None if hover is None else hover[mask],
+            hoverinfo='text' if hover is not None else 'x+y',
+        ))
+    fig.update_layout(title=title, legend_title='Cluster', plot_bgcolor='white')
+    return fig
@@ -1,78 +1,16 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import re
-import nltk
-import spacy
-import subprocess
-import sys
 
-
-
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.decomposition import PCA
-from sklearn.cluster import KMeans
-import hdbscan
-import umap.umap_ as umap
-
-from sentence_transformers import SentenceTransformer
-
-import matplotlib.pyplot as plt
-
-# Charger le modèle spacy FR pour lemmatisation
-nlp = spacy.load("fr_core_news_sm")
-
-# Charger Sentence-BERT
-sbert_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-
-# Téléchargement stopwords
-nltk.download('stopwords')
-from nltk.corpus import stopwords
-stop_words = set(stopwords.words("french"))
-
-# -----------------------------
-# Fonction de nettoyage
-# -----------------------------
-def preprocess_text(text):
-    text = text.lower()
-    text = re.sub(r"[^a-zA-Zàâçéèêëîïôûùüÿñæœ\s]", " ", text)
-    doc = nlp(text)
-    tokens = [token.lemma_ for token in doc if token.text not in stop_words and not token.is_punct]
-    return " ".join(tokens)
-
-# -----------------------------
-# Fonction de vectorisation
-# -----------------------------
-def vectorize_texts(texts, method="TF-IDF"):
-    if method == "TF-IDF":
-        vectorizer = TfidfVectorizer()
-        vectors = vectorizer.fit_transform(texts).toarray()
-    else:  # Sentence-BERT
-        vectors = sbert_model.encode(texts)
-    return vectors
-
-# -----------------------------
-# Réduction dimension
-# -----------------------------
-def reduce_dimensions(vectors, method="UMAP"):
-    if method == "PCA":
-        reducer = PCA(n_components=2)
-    else:
-        reducer = umap.UMAP(n_neighbors=15, min_dist=0.1, n_components=2, random_state=42)
-    reduced = reducer.fit_transform(vectors)
-    return reduced
-
-# -----------------------------
-# Clustering
-# -----------------------------
-def cluster_texts(vectors, method="KMeans", n_clusters=5):
-    if method == "KMeans":
-        model = KMeans(n_clusters=n_clusters, random_state=42)
-        labels = model.fit_predict(vectors)
-    else:  # HDBSCAN
-        model = hdbscan.HDBSCAN(min_cluster_size=5)
-        labels = model.fit_predict(vectors)
-    return labels
+# spaCy, Sentence-BERT, UMAP et HDBSCAN sont chargés à la première
+# utilisation et gardés en mémoire pour tout le processus. Le clustering
+# lui-même tourne dans un processus de travail (jobs.py).
+from preprocessing import BATCH_SIZE, N_PROCESS, preprocess_texts
+from clustering import LARGE_CORPUS_ROWS
+from ann_index import load_index
+import jobs
+from density import MAX_POINTS, grid_for
+from charts import PALETTES, density_figure, points_figure
 
 # -----------------------------
 # Interface Streamlit
@@ -90,39 +28,177 @@ default_texts = [
 ]
 
 user_input = st.text_area("Collez vos textes (un par ligne) :", "\n".join(default_texts))
-texts = [preprocess_text(t.strip()) for t in user_input.split("\n") if t.strip()]
+
+# Prétraitement par lots (dans le processus de travail) ; les lignes déjà
+# lemmatisées sont reprises telles quelles
+with st.expander("Options de prétraitement"):
+    batch_size = st.number_input("Taille des lots spaCy", min_value=16, max_value=4096, value=BATCH_SIZE, step=16)
+    n_process = st.number_input("Processus spaCy", min_value=1, max_value=16, value=N_PROCESS)
+lines = [t.strip() for t in user_input.split("\n") if t.strip()]
 
 # Paramètres
 vec_method = st.selectbox("Méthode de vectorisation :", ["TF-IDF", "Sentence-BERT"])
+min_df, max_features = 1, 0
+if vec_method == "TF-IDF":
+    # Élagage du vocabulaire : termes trop rares ignorés, taille maximale
+    min_df = st.number_input("Nombre minimal de documents par terme", min_value=1, value=1)
+    max_features = st.number_input("Taille maximale du vocabulaire (0 = illimitée)", min_value=0, value=0, step=1000)
 dim_method = st.selectbox("Méthode de réduction de dimension :", ["PCA", "UMAP"])
 clust_method = st.selectbox("Algorithme de clustering :", ["KMeans", "HDBSCAN"])
 
-if clust_method == "KMeans":
+large_mode = st.checkbox(
+    "Mode grand corpus (k-means par mini-lots, choix de k automatique)",
+    value=len(lines) >= LARGE_CORPUS_ROWS,
+)
+
+n_clusters = None
+if clust_method == "KMeans" and large_mode:
+    k_min, k_max = st.slider("Valeurs de k à tester", 2, 30, (2, 10))
+elif clust_method == "KMeans":
     n_clusters = st.slider("Nombre de clusters (KMeans uniquement)", 2, 10, 3)
-else:
-    n_clusters = None
+
+# Un seul représentant par groupe de quasi-doublons est vectorisé et
+# regroupé, avec l'effectif du groupe comme poids. HDBSCAN ne prend pas de
+# poids : un message répété des centaines de fois deviendrait un point isolé
+# (bruit), le regroupement est donc désactivé
+collapse = st.checkbox(
+    "Regrouper les quasi-doublons (MinHash)",
+    value=clust_method != "HDBSCAN",
+    disabled=clust_method == "HDBSCAN",
+    help="Indisponible avec HDBSCAN, qui ne tient pas compte des effectifs",
+) and clust_method != "HDBSCAN"
+
+# Le pipeline ajusté est réutilisé : les nouveaux textes sont affectés sans
+# réapprentissage, sauf dérive au-delà des seuils
+force_refit = st.checkbox("Forcer le réapprentissage complet", value=False)
+
+params = {
+    'vec_method': vec_method,
+    'min_df': int(min_df),
+    'max_features': int(max_features) or None,
+    'dim_method': dim_method,
+    'clust_method': clust_method,
+    'n_clusters': n_clusters,
+    'large': large_mode,
+    'k_range': (k_min, k_max) if clust_method == "KMeans" and large_mode else None,
+}
+
+# Exécution correspondant aux textes et paramètres affichés
+key = jobs.job_key(lines, params, collapse)
 
 if st.button("🚀 Lancer le clustering"):
-    if len(texts) < 2:
+    if len(lines) < 2:
         st.warning("Veuillez entrer au moins 2 textes.")
     else:
-        # Vectorisation
-        vectors = vectorize_texts(texts, method=vec_method)
-
-        # Réduction
-        reduced = reduce_dimensions(vectors, method=dim_method)
-
-        # Clustering
-        labels = cluster_texts(vectors, method=clust_method, n_clusters=n_clusters if n_clusters else 0)
-
-        # Affichage des résultats
-        df = pd.DataFrame({"Texte": texts, "Cluster": labels})
-        st.write("### Résultats du clustering")
-        st.dataframe(df)
-
-        # Visualisation
-        fig, ax = plt.subplots()
-        scatter = ax.scatter(reduced[:,0], reduced[:,1], c=labels, cmap="tab10", s=80)
-        legend1 = ax.legend(*scatter.legend_elements(), title="Clusters")
-        ax.add_artist(legend1)
-        st.pyplot(fig)
+        jobs.submit(lines, params, collapse, force_refit=force_refit, batch_size=int(batch_size), n_process=int(n_process))
+
+
+@st.fragment(run_every=1)
+def show_progress(key):
+    job = jobs.status(key)
+    if job is None or job['état'] not in ('en attente', 'en cours', 'annulation'):
+        # Terminé pendant l'attente : affichage complet des résultats
+        st.rerun()
+    st.progress(job['avancement'], text=f"{job['état'].capitalize()} : {job['étape'] or '…'}")
+    if job['état'] != 'annulation' and st.button("⏹ Annuler"):
+        jobs.cancel(key)
+
+
+def zoom_slider(column, label, low, high):
+    # Axe sans étendue (textes identiques, un seul groupe, projection à une
+    # dimension) : pas de zoom possible sur cet axe
+    low, high = float(low), float(high)
+    if not high > low:
+        return low, high
+    return column.slider(label, low, high, (low, high), step=(high - low) / 200)
+
+
+def show_results(key, result):
+    report = result['report']
+    labels, reduced = result['labels'], result['coords']
+    if result['n_groups'] is not None:
+        st.caption(f"{result['n_groups']} groupes de quasi-doublons pour {len(labels)} lignes")
+
+    if report['mode'] == 'cache':
+        st.info("Aucun nouveau texte : résultats du pipeline enregistré.")
+    elif report['mode'] == 'affectation':
+        st.info(f"{report['nouveaux']} nouveaux textes affectés sans réapprentissage.")
+    elif report['dérive'] is not None:
+        st.warning("Dérive détectée : pipeline réappris sur l'ensemble du corpus.")
+    if report['dérive'] is not None:
+        st.caption(" · ".join(f"{name} : {value:.3f}" for name, value in report['dérive'].items() if not isinstance(value, bool)))
+
+    if result['scores'] is not None:
+        st.write(f"### Nombre de clusters suggéré : {result['n_clusters']}")
+        st.line_chart(result['scores'].set_index("k"))
+
+    # Affichage des résultats
+    df = pd.DataFrame({"Texte": result['texts'], "Cluster": labels})
+    st.write("### Résultats du clustering")
+    st.dataframe(df)
+
+    # Visualisation : grille de densité calculée une fois par résultat ; les
+    # points ne sont dessinés que si la zone affichée en contient peu
+    st.write("### Projection 2D")
+    # Un réapprentissage forcé produit un nouveau résultat sous la même clé
+    grid = grid_for((key, result['finished_at']), reduced, labels)
+    view = st.columns(3)
+    palette = view[0].selectbox("Couleurs", list(PALETTES))
+    (x_low, y_low), (x_high, y_high) = grid.low, grid.high
+    x_range = zoom_slider(view[1], "Zoom horizontal", x_low, x_high)
+    y_range = zoom_slider(view[2], "Zoom vertical", y_low, y_high)
+
+    if grid.count_in(x_range, y_range) <= MAX_POINTS:
+        visible = (
+            (reduced[:, 0] >= x_range[0]) & (reduced[:, 0] <= x_range[1])
+            & (reduced[:, 1] >= y_range[0]) & (reduced[:, 1] <= y_range[1])
+        )
+        texts = np.asarray(result['texts'], dtype=object)
+        fig = points_figure(reduced[visible], labels[visible], grid.clusters, palette, hover=texts[visible])
+        st.caption(f"{int(visible.sum())} points affichés")
+    else:
+        fig = density_figure(grid.tiles(x_range, y_range), grid.clusters, palette)
+        st.caption(
+            f"Densité des textes par tuile (couleur du cluster majoritaire) : "
+            f"zoomez jusqu'à {MAX_POINTS} textes pour afficher les points."
+        )
+    st.plotly_chart(fig, use_container_width=True)
+
+
+job = jobs.status(key)
+if job is not None and job['état'] in ('en attente', 'en cours', 'annulation'):
+    show_progress(key)
+elif job is not None and job['état'] == 'annulé':
+    st.info("Clustering annulé.")
+elif job is not None and job['état'] == 'erreur':
+    st.error(f"Échec du clustering : {job['erreur']}")
+elif job is not None:
+    result = jobs.result(key)
+    if result is not None:
+        show_results(key, result)
+
+with st.expander("Exécutions en arrière-plan"):
+    runs = jobs.list_jobs()
+    if runs.empty:
+        st.caption("Aucune exécution lancée depuis le démarrage du serveur.")
+    else:
+        st.dataframe(runs)
+
+# -----------------------------
+# Recherche d'incidents similaires
+# -----------------------------
+st.write("### 🔎 Incidents similaires")
+query = st.text_input("Décrivez un nouvel incident :")
+if query.strip():
+    # Pipeline et index de l'exécution affichée (mêmes textes et paramètres)
+    model = jobs.model(key)
+    index = load_index(key) if model is not None else None
+    if index is None:
+        st.info("Lancez d'abord le clustering sur ces textes avec ces paramètres pour construire l'index.")
+    else:
+        query_text = preprocess_texts([query.strip()])
+        # Requête ponctuelle : vecteur non conservé dans le stockage
+        vectors = model.vectorize(query_text, store=False)
+        ids, scores = index.search(vectors, k=10)
+        st.write(f"Cluster estimé : {model.predict_vectors(vectors)[0]}")
+        st.dataframe(index.table.iloc[ids].assign(Similarité=scores.round(3)))
@@ -0,0 +1,413 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import PCA, TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics import silhouette_score
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import Normalizer
+
+from cache_paths import CACHE_ROOT
+# Sentence-BERT, UMAP et HDBSCAN sont chargés à la première utilisation
+from embeddings import encode_texts, text_keys
+from nlp_resources import SBERT_MODEL
+
+# -----------------------------
+# Vectorisation, réduction et clustering des textes
+# -----------------------------
+# La matrice TF-IDF reste creuse (CSR float32) de bout en bout : SVD
+# tronquée au lieu de PCA, KMeans directement sur la matrice creuse, HDBSCAN
+# sur une projection SVD normalisée. La mémoire dépend du nombre de termes
+# non nuls, pas de documents × vocabulaire.
+#
+# Mode grand corpus : k-means par mini-lots, balayage de k sur tous les
+# cœurs, chaque k noté par une silhouette calculée sur un échantillon.
+# HDBSCAN travaille toujours sur une projection réduite.
+#
+# Le pipeline ajusté (vocabulaire, réducteurs, centroïdes ou données de
+# prédiction HDBSCAN) est sauvegardé par jeu de paramètres : les textes
+# ajoutés ensuite sont affectés par transform + predict, sans réapprentissage,
+# tant que les indicateurs de dérive restent sous leurs seuils.
+
+SVD_COMPONENTS = 100
+LARGE_CORPUS_ROWS = 10_000
+SILHOUETTE_SAMPLE = 5_000
+MINIBATCH_SIZE = 4_096
+HDBSCAN_COMPONENTS = 50
+
+MODEL_DIR = os.environ.get(
+    "DONNEES_CLUSTERING_DIR",
+    os.path.join(CACHE_ROOT, "clustering"),
+)
+
+# Seuils de dérive déclenchant un réapprentissage complet
+DRIFT_DISTANCE_RATIO = 1.25   # distance moyenne au centroïde / distance à l'apprentissage
+DRIFT_OOV_INCREASE = 0.10     # hausse du taux de mots hors vocabulaire TF-IDF
+DRIFT_NOISE_INCREASE = 0.15   # hausse de la part de bruit HDBSCAN
+DRIFT_MAX_GROWTH = 0.5        # textes affectés depuis l'apprentissage / textes appris
+
+# Pipelines gardés en mémoire par l'interface (voir cached_model)
+MAX_CACHED_MODELS = 4
+
+_model_lock = threading.Lock()
+_models = OrderedDict()
+_models_lock = threading.Lock()
+
+
+# -----------------------------
+# Réduction dimension
+# -----------------------------
+def make_reducer(vectors, method="UMAP"):
+    if method == "PCA" and sp.issparse(vectors):
+        return TruncatedSVD(n_components=2, random_state=42)
+    if method == "PCA":
+        # Pas plus d'axes que de textes ou de dimensions
+        return PCA(n_components=max(1, min(2, *vectors.shape)))
+    import umap.umap_ as umap
+    return umap.UMAP(n_neighbors=15, min_dist=0.1, n_components=2, random_state=42)
+
+
+def _plane(coords):
+    # Coordonnées 2D ; un réducteur ajusté sur très peu de textes peut rendre
+    # un seul axe, complété par des zéros
+    coords = np.asarray(coords, dtype=np.float32)
+    if coords.shape[1] < 2:
+        coords = np.pad(coords, ((0, 0), (0, 2 - coords.shape[1])))
+    return coords
+
+
+def make_svd(vectors, n_components=SVD_COMPONENTS):
+    # Projection dense et compacte d'une matrice creuse (analyse sémantique latente)
+    n_components = max(1, min(n_components, vectors.shape[1] - 1))
+    return make_pipeline(TruncatedSVD(n_components=n_components, random_state=42), Normalizer(copy=False))
+
+
+def make_cluster_reducer(vectors, n_components=HDBSCAN_COMPONENTS):
+    # Réducteur (non ajusté) appliqué avant HDBSCAN, None si inutile
+    if sp.issparse(vectors):
+        return make_svd(vectors, n_components)
+    if vectors.shape[1] > n_components and len(vectors) > n_components:
+        return PCA(n_components=n_components, random_state=42)
+    return None
+
+
+# -----------------------------
+# Clustering
+# -----------------------------
+def make_clusterer(method="KMeans", n_clusters=5, large=False, prediction_data=False):
+    if method == "KMeans" and large:
+        return MiniBatchKMeans(n_clusters=n_clusters, batch_size=MINIBATCH_SIZE, n_init=3, random_state=42)
+    if method == "KMeans":
+        # KMeans accepte directement la matrice creuse
+        return KMeans(n_clusters=n_clusters, random_state=42)
+    import hdbscan
+    return hdbscan.HDBSCAN(min_cluster_size=5, core_dist_n_jobs=-1, prediction_data=prediction_data)
+
+
+def _score_k(vectors, k, sample_weight=None):
+    model = make_clusterer("KMeans", k, large=True)
+    labels = model.fit_predict(vectors, sample_weight=sample_weight)
+    if len(np.unique(labels)) < 2:
+        return k, np.nan, model
+    sample_size = min(SILHOUETTE_SAMPLE, vectors.shape[0])
+    score = silhouette_score(vectors, labels, sample_size=sample_size, random_state=42)
+    return k, score, model
+
+
+def sweep_k(vectors, k_values, n_jobs=-1, sample_weight=None):
+    # Un k-means par mini-lots par valeur de k, en parallèle ; retourne
+    # (scores par k, k suggéré, modèle ajusté du k suggéré)
+    requested = list(k_values)
+    if not requested:
+        raise ValueError("Aucune valeur de k à tester")
+    n_samples = vectors.shape[0]
+    # La silhouette n'est définie que pour 2 <= k < nombre de textes
+    k_values = [k for k in requested if 2 <= k < n_samples]
+    if not k_values:
+        # Trop peu de textes : un seul k, le plus petit demandé, borné au
+        # nombre de textes
+        k = max(1, min(min(requested), n_samples))
+        model = make_clusterer("KMeans", k, large=True)
+        model.fit(vectors, sample_weight=sample_weight)
+        return pd.DataFrame({"k": [k], "Silhouette": [np.nan]}), k, model
+    results = Parallel(n_jobs=n_jobs)(delayed(_score_k)(vectors, k, sample_weight) for k in k_values)
+    scores = pd.DataFrame([(k, score) for k, score, _ in results], columns=["k", "Silhouette"])
+    values = scores["Silhouette"].to_numpy()
+    # Aucun score défini (un seul groupe trouvé pour chaque k) : plus petit k
+    best = 0 if np.isnan(values).all() else int(np.nanargmax(values))
+    return scores, results[best][0], results[best][2]
+
+
+# -----------------------------
+# Pipeline ajusté réutilisable
+# -----------------------------
+def model_key(params):
+    payload = json.dumps({**params, 'sbert': SBERT_MODEL}, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=12).hexdigest()
+
+
+class ClusteringModel:
+    # `params` : vec_method, min_df, max_features, dim_method, clust_method,
+    # n_clusters, large, k_range
+    def __init__(self, params):
+        self.params = dict(params)
+        self.key = model_key(params)
+        self.vectorizer = None
+        self.reducer = None
+        self.cluster_reducer = None
+        self.clusterer = None
+        self.scores = None
+        self.fit_id = None
+        self.baseline = {}
+        self.n_fitted = 0
+        self.n_assigned = 0
+        # Textes déjà traités : empreinte, étiquette, coordonnées 2D
+        self.keys = np.zeros(0, dtype=np.uint64)
+        self.labels = np.zeros(0, dtype=np.int32)
+        self.coords = np.zeros((0, 2), dtype=np.float32)
+        self._sorted = None
+
+    # --- vectorisation et affectation ---
+    def vectorize(self, texts, store=True):
+        # store=False : vecteurs Sentence-BERT non conservés (voir encode_texts)
+        if self.params['vec_method'] == "TF-IDF":
+            return self.vectorizer.transform(texts)
+        return encode_texts(texts, store=store)
+
+    def predict(self, texts):
+        # Clusters de textes nouveaux, sans les mémoriser
+        return self.predict_vectors(self.vectorize(texts))
+
+    def predict_vectors(self, vectors):
+        # Idem, pour des textes déjà vectorisés par ce pipeline
+        return self._predict(vectors)[0]
+
+    def _oov_rate(self, texts):
+        if self.vectorizer is None:
+            return None
+        analyzer = self.vectorizer.build_analyzer()
+        vocabulary = self.vectorizer.vocabulary_
+        total = unknown = 0
+        for text in texts:
+            tokens = analyzer(text)
+            total += len(tokens)
+            unknown += sum(token not in vocabulary for token in tokens)
+        return unknown / total if total else 0.0
+
+    def _predict(self, vectors):
+        # Retourne (étiquettes, distance au centroïde ou None)
+        if self.params['clust_method'] == "KMeans":
+            distances = self.clusterer.transform(vectors)
+            return distances.argmin(axis=1).astype(np.int32), distances.min(axis=1)
+        import hdbscan
+        points = vectors if self.cluster_reducer is None else self.cluster_reducer.transform(vectors)
+        labels, _ = hdbscan.approximate_predict(self.clusterer, points)
+        return labels.astype(np.int32), None
+
+    def _metrics(self, texts, labels, distances):
+        metrics = {}
+        if distances is not None:
+            metrics['distance'] = float(np.mean(distances))
+        else:
+            metrics['bruit'] = float(np.mean(labels == -1))
+        oov = self._oov_rate(texts)
+        if oov is not None:
+            metrics['hors_vocabulaire'] = oov
+        return metrics
+
+    def fit(self, texts, weights=None):
+        # `weights` : effectif de chaque texte (groupes de quasi-doublons),
+        # pris en compte par k-means ; HDBSCAN n'en tient pas compte, les
+        # textes doivent alors lui être passés sans regroupement
+        if weights is not None and self.params['clust_method'] == "HDBSCAN":
+            raise ValueError("HDBSCAN ne tient pas compte des poids : regroupement des quasi-doublons impossible")
+        params = self.params
+        if params['vec_method'] == "TF-IDF":
+            self.vectorizer = TfidfVectorizer(
+                min_df=params.get('min_df', 1), max_features=params.get('max_features'), dtype=np.float32,
+            )
+            vectors = self.vectorizer.fit_transform(texts)
+        else:
+            vectors = encode_texts(texts)
+
+        self.reducer = make_reducer(vectors, params['dim_method'])
+        coords = _plane(self.reducer.fit_transform(vectors))
+
+        if params['clust_method'] == "KMeans" and params.get('large') and params.get('k_range'):
+            k_min, k_max = params['k_range']
+            self.scores, _, self.clusterer = sweep_k(vectors, range(k_min, k_max + 1), sample_weight=weights)
+            labels = self.clusterer.labels_
+        elif params['clust_method'] == "KMeans":
+            # Pas plus de clusters que de textes (un seul groupe de quasi-doublons...)
+            n_clusters = min(params['n_clusters'], len(texts))
+            self.clusterer = make_clusterer("KMeans", n_clusters, params.get('large', False))
+            labels = self.clusterer.fit_predict(vectors, sample_weight=weights)
+        else:
+            self.cluster_reducer = make_cluster_reducer(vectors)
+            points = vectors if self.cluster_reducer is None else self.cluster_reducer.fit_transform(vectors)
+            self.clusterer = make_clusterer("HDBSCAN", prediction_data=True)
+            labels = self.clusterer.fit_predict(points)
+
+        labels = np.asarray(labels, dtype=np.int32)
+        # Identifie cet ajustement (les index dérivés sont à reconstruire après un réapprentissage)
+        self.fit_id = os.urandom(8).hex()
+        distances = self.clusterer.transform(vectors).min(axis=1) if params['clust_method'] == "KMeans" else None
+        self.baseline = self._metrics(texts, labels, distances)
+        self.n_fitted = len(texts)
+        self.n_assigned = 0
+        self.keys = np.zeros(0, dtype=np.uint64)
+        self.labels = np.zeros(0, dtype=np.int32)
+        self.coords = np.zeros((0, 2), dtype=np.float32)
+        self._remember(text_keys(texts), labels, coords)
+        return labels, coords
+
+    def assign(self, texts):
+        # Affecte des textes nouveaux sans réapprentissage ; retourne
+        # (étiquettes, coordonnées, indicateurs de dérive)
+        vectors = self.vectorize(texts)
+        labels, distances = self._predict(vectors)
+        coords = _plane(self.reducer.transform(vectors))
+        self.n_assigned += len(texts)
+        self._remember(text_keys(texts), labels, coords)
+        return labels, coords, self.drift(self._metrics(texts, labels, distances))
+
+    def drift(self, metrics):
+        # Indicateurs du lot affecté comparés à ceux de l'apprentissage
+        report = {'croissance': self.n_assigned / max(self.n_fitted, 1)}
+        exceeded = report['croissance'] > DRIFT_MAX_GROWTH
+        if 'distance' in metrics and self.baseline.get('distance'):
+            report['distance_relative'] = metrics['distance'] / self.baseline['distance']
+            exceeded |= report['distance_relative'] > DRIFT_DISTANCE_RATIO
+        if 'bruit' in metrics:
+            report['hausse_bruit'] = metrics['bruit'] - self.baseline.get('bruit', 0.0)
+            exceeded |= report['hausse_bruit'] > DRIFT_NOISE_INCREASE
+        if 'hors_vocabulaire' in metrics:
+            report['hausse_hors_vocabulaire'] = metrics['hors_vocabulaire'] - self.baseline.get('hors_vocabulaire', 0.0)
+            exceeded |= report['hausse_hors_vocabulaire'] > DRIFT_OOV_INCREASE
+        report['réapprentissage'] = bool(exceeded)
+        return report
+
+    # --- textes déjà traités ---
+    def _remember(self, keys, labels, coords):
+        new = self.lookup(keys) < 0
+        keys, unique = np.unique(keys[new], return_index=True)
+        self.keys = np.concatenate([self.keys, keys])
+        self.labels = np.concatenate([self.labels, np.asarray(labels, dtype=np.int32)[new][unique]])
+        self.coords = np.concatenate([self.coords, np.asarray(coords, dtype=np.float32)[new][unique]])
+        self._sorted = None
+
+    def lookup(self, keys):
+        # Position de chaque empreinte parmi les textes traités, -1 si absente
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        if len(self.keys) == 0 or len(keys) == 0:
+            return rows
+        if self._sorted is None:
+            order = np.argsort(self.keys, kind='stable')
+            self._sorted = (self.keys[order], order)
+        sorted_keys, order = self._sorted
+        pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+        found = sorted_keys[pos] == keys
+        rows[found] = order[pos[found]]
+        return rows
+
+    # --- persistance ---
+    @property
+    def path(self):
+        return os.path.join(MODEL_DIR, f"{self.key}.joblib")
+
+    def save(self):
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        tmp_path = os.path.join(MODEL_DIR, ".tmp-" + os.path.basename(self.path))
+        try:
+            joblib.dump(self, tmp_path)
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_sorted'] = None
+        return state
+
+
+def _model_path(params):
+    return os.path.join(MODEL_DIR, f"{model_key(params)}.joblib")
+
+
+def _load(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        return joblib.load(path)
+    except Exception:
+        # Artefact illisible (version de bibliothèque, fichier tronqué) : on réapprend
+        return None
+
+
+def load_model(params):
+    return _load(_model_path(params))
+
+
+def cached_model(path):
+    # Pipeline enregistré à `path` (copie propre à une exécution, voir
+    # jobs.model), gardé en mémoire entre les reruns de l'interface (lecture
+    # seule : recherche, prédiction). Relu seulement si le fichier change.
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _models_lock:
+        entry = _models.get(path)
+        if entry is not None and entry[0] == stamp:
+            _models.move_to_end(path)
+            return entry[1]
+    model = _load(path)
+    if model is None:
+        return None
+    with _models_lock:
+        _models[path] = (stamp, model)
+        _models.move_to_end(path)
+        while len(_models) > MAX_CACHED_MODELS:
+            _models.popitem(last=False)
+    return model
+
+
+def cluster_corpus(texts, params, force_refit=False, weights=None):
+    # Retourne (modèle, étiquettes, coordonnées 2D, rapport). Le rapport
+    # indique le mode retenu : 'cache' (rien de nouveau), 'affectation'
+    # (nouveaux textes affectés) ou 'apprentissage' (ajustement complet).
+    with _model_lock:
+        model = None if force_refit else load_model(params)
+        report = {'mode': 'apprentissage', 'nouveaux': len(texts), 'dérive': None}
+
+        if model is not None:
+            keys = text_keys(texts)
+            rows = model.lookup(keys)
+            missing = np.flatnonzero(rows < 0)
+            report['nouveaux'] = len(missing)
+            if len(missing) == 0:
+                report['mode'] = 'cache'
+                return model, model.labels[rows], model.coords[rows], report
+
+            _, _, drift = model.assign([texts[i] for i in missing])
+            report['dérive'] = drift
+            if not drift['réapprentissage']:
+                report['mode'] = 'affectation'
+                model.save()
+                rows = model.lookup(keys)
+                return model, model.labels[rows], model.coords[rows], report
+
+        model = ClusteringModel(params)
+        labels, coords = model.fit(texts, weights)
+        model.save()
+        return model, labels, coords, report
@@ -0,0 +1,224 @@
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+
+# -----------------------------
+# Cube d'agrégats pré-calculés
+# -----------------------------
+# Construit une fois par fichier chargé : nombre de produits, sommes et
+# sommes des carrés des compteurs et du délai avant premier incident, par
+# (modèle, filiale, mois de fabrication, tranche d'incidents, tranche de
+# retours). Quand les filtres actifs tombent sur ces dimensions, les
+# indicateurs et graphiques sont calculés sur le cube (quelques milliers de
+# cellules) au lieu des lignes brutes.
+
+CATEGORY_DIMS = ['modèle', 'filiale']
+DATE_COL = 'Date de fabrication'
+MONTH_DIM = 'mois_fabrication'
+COUNTER_COLS = ['nombre_incidents', 'nombre_retours']
+DELAY_COL = 'délai_premier_incident'
+
+# Les compteurs sont gardés valeur par valeur jusqu'à MAX_EXACT, au-delà une
+# seule tranche « MAX_EXACT et plus ». Tranche -1 : valeur manquante.
+MAX_EXACT = 20
+
+
+def _bucket_name(col):
+    return f"tranche_{col.split('_', 1)[1]}"
+
+
+def cube_table(df):
+    keys = {}
+    for col in CATEGORY_DIMS:
+        if col in df.columns:
+            keys[col] = df[col]
+    if DATE_COL in df.columns:
+        keys[MONTH_DIM] = df[DATE_COL].dt.to_period('M').dt.start_time
+    for col in COUNTER_COLS:
+        if col in df.columns:
+            values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+            buckets = np.where(np.isnan(values), -1, np.minimum(np.nan_to_num(values), MAX_EXACT))
+            keys[_bucket_name(col)] = buckets.astype(np.int8)
+
+    measures = pd.DataFrame(keys, index=df.index)
+    measures['nb_produits'] = 1
+    for col in COUNTER_COLS + [DELAY_COL]:
+        if col in df.columns:
+            values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+            measures[col] = values
+            measures[f'{col}_carres'] = values ** 2
+            if col == DELAY_COL:
+                measures[f'{col}_n'] = ~np.isnan(values)
+
+    if not keys:
+        return measures.sum().to_frame().T
+    table = measures.groupby(list(keys), observed=True, dropna=False, sort=False).sum(min_count=0)
+    return table.reset_index()
+
+
+def _dims(table):
+    return [c for c in CATEGORY_DIMS + [MONTH_DIM] + [_bucket_name(c) for c in COUNTER_COLS] if c in table.columns]
+
+
+def update_table(table, added=None, removed=None):
+    # Table du cube après ajout des lignes `added` et retrait des lignes
+    # `removed` : les mesures sont des sommes, seules ces lignes sont agrégées
+    dims = _dims(table)
+    parts = [table]
+    if added is not None and len(added):
+        parts.append(cube_table(added))
+    if removed is not None and len(removed):
+        negative = cube_table(removed)
+        measures = [c for c in negative.columns if c not in dims]
+        negative[measures] = -negative[measures].astype('float64')
+        parts.append(negative)
+    if len(parts) == 1 or not dims:
+        return table
+
+    combined = pd.concat(parts, ignore_index=True)
+    for col in CATEGORY_DIMS:
+        if col in dims:
+            combined[col] = combined[col].astype('category')
+    result = combined.groupby(dims, observed=True, dropna=False, sort=False).sum(min_count=0)
+    # Cellules vidées par le retrait des anciennes versions des lignes
+    result = result[result['nb_produits'] > 0].reset_index()
+    for col in result.columns:
+        if col not in dims and pd.api.types.is_integer_dtype(table[col].dtype):
+            result[col] = result[col].round().astype(table[col].dtype)
+    return result
+
+
+class MetricsCube:
+    def __init__(self, df, table=None):
+        # `table` : table déjà calculée pour `df` (voir update_table)
+        self.table = cube_table(df) if table is None else table
+        self.counter_max = {
+            col: df[col].max() for col in COUNTER_COLS if col in df.columns
+        }
+        if DATE_COL in df.columns:
+            dates = df[DATE_COL].dropna()
+            self.date_min, self.date_max = dates.min(), dates.max()
+            self.month_starts_only = bool((dates == dates.dt.to_period('M').dt.start_time).all())
+            self.days_only = bool((dates == dates.dt.normalize()).all())
+
+    def _counter_mask(self, col, low, high):
+        buckets = self.table[_bucket_name(col)].to_numpy()
+        top = self.counter_max[col]
+        if low > MAX_EXACT or (MAX_EXACT <= high < top):
+            return None
+        if high >= top:
+            return buckets >= low
+        return (buckets >= low) & (buckets <= high)
+
+    def _date_mask(self, low, high):
+        low, high = pd.Timestamp(low), pd.Timestamp(high)
+        months = self.table[MONTH_DIM]
+        if self.month_starts_only:
+            return ((months >= low) & (months <= high)).to_numpy()
+        if low <= self.date_min and high >= self.date_max:
+            return months.notna().to_numpy()
+        month_start = low == low.to_period('M').start_time
+        month_end = high == high.to_period('M').end_time.normalize()
+        if self.days_only and month_start and month_end:
+            return ((months >= low) & (months <= high)).to_numpy()
+        return None
+
+    def subset(self, categories=None, ranges=None):
+        # categories : {colonne: libellés retenus}, ranges : {colonne: (min, max)}.
+        # Retourne None si un filtre ne tombe pas sur les dimensions du cube.
+        mask = np.ones(len(self.table), dtype=bool)
+        for col, values in (categories or {}).items():
+            if values is None:
+                continue
+            if col not in self.table.columns:
+                return None
+            mask &= self.table[col].isin(values).to_numpy()
+        for col, (low, high) in (ranges or {}).items():
+            if col in COUNTER_COLS and col in self.counter_max:
+                found = self._counter_mask(col, low, high)
+            elif col == DATE_COL and MONTH_DIM in self.table.columns:
+                found = self._date_mask(low, high)
+            else:
+                found = None
+            if found is None:
+                return None
+            mask &= found
+        return self.table[mask]
+
+
+def kpis(table):
+    result = {'nb_produits': int(table['nb_produits'].sum())}
+    for col in COUNTER_COLS:
+        if col in table.columns:
+            result[col] = int(table[col].sum())
+    if DELAY_COL in table.columns:
+        n = table[f'{DELAY_COL}_n'].sum()
+        result[DELAY_COL] = table[DELAY_COL].sum() / n if n else np.nan
+    return result
+
+
+def std(table, col):
+    n = table['nb_produits'].sum() if col != DELAY_COL else table[f'{DELAY_COL}_n'].sum()
+    if n < 2:
+        return np.nan
+    mean = table[col].sum() / n
+    return np.sqrt(max(table[f'{col}_carres'].sum() / n - mean ** 2, 0.0) * n / (n - 1))
+
+
+def totals(table, by, measure):
+    return table.groupby(by, observed=True)[measure].sum().reset_index()
+
+
+def group_report(table, by):
+    # Rapport par groupe : effectifs, totaux et moyennes
+    sums = [c for c in ['nb_produits'] + COUNTER_COLS + [DELAY_COL, f'{DELAY_COL}_n'] if c in table.columns]
+    report = table.groupby(by, observed=True, dropna=False)[sums].sum()
+    for col in COUNTER_COLS:
+        if col in report.columns:
+            report[f'{col}_par_produit'] = report[col] / report['nb_produits']
+    if DELAY_COL in report.columns:
+        report[f'{DELAY_COL}_moyen'] = report[DELAY_COL] / report[f'{DELAY_COL}_n'].where(report[f'{DELAY_COL}_n'] > 0)
+        report = report.drop(columns=[DELAY_COL, f'{DELAY_COL}_n'])
+    return report.reset_index()
+
+
+def summarize(cube, engine, df, selected, contains, ranges):
+    # Agrégats pour l'état des filtres : depuis le cube si possible, sinon
+    # depuis les lignes filtrées `df`.
+    table = None
+    if not any(v for col, v in contains.items() if col not in CATEGORY_DIMS):
+        categories = {
+            col: engine.matching_categories(col, selected.get(col), contains.get(col))
+            for col in CATEGORY_DIMS if col in engine.categories
+        }
+        table = cube.subset(categories, ranges)
+    if table is None:
+        with stage("Agrégats depuis les lignes", rows_in=len(df)):
+            table = cube_table(df)
+    return table
+
+
+_cubes = {}
+_lock = threading.Lock()
+
+
+def cube_for(df):
+    with _lock:
+        entry = _cubes.get(id(df))
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+        for key in [k for k, (ref, _) in _cubes.items() if ref() is None]:
+            del _cubes[key]
+    with stage("Cube d'agrégats", rows_in=len(df)):
+        cube = MetricsCube(df)
+    remember_cube(df, cube)
+    return cube
+
+
+def remember_cube(df, cube):
+    with _lock:
+        _cubes[id(df)] = (weakref.ref(df), cube)
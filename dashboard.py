@@ -0,0 +1,370 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+
+from pipeline import apply_filters, load_fleet, load_store, merge_extract
+from filters import engine_for
+from fleet_store import clear_store, store_history
+from cube import MONTH_DIM, kpis, totals
+from paging import page, page_count
+from charts import box_figure, box_summary, cohort_heatmap, histogram_bins, histogram_figure, survival_figure
+from survival import COHORT_DIMS, HORIZONS, INSTALL_COL, LAST_SEEN_COL, reliability, step_points
+from instrumentation import PROFILING_DEFAULT, Profiler, stage, start_profiling, stop_profiling
+from export import EXPORT_FORMATS, build_export, cached_export, export_file_name, export_mime
+
+# -----------------------------
+# Tableau de bord des produits
+# -----------------------------
+# Page commune aux deux points d'entrée (app.py, VF.py) : seul le nom du
+# script, repris dans les mesures de performance, les distingue.
+
+
+def run(script):
+    # Configuration de la page
+    st.set_page_config(
+        page_title="Dashboard Produits - Filtres Avancés",
+        page_icon="🔍",
+        layout="wide"
+    )
+
+    # Titre principal
+    st.title("🔍 Analyse des Produits avec Filtres Avancés")
+
+    # Mesures de performance par étape (facultatif)
+    profiling_enabled = st.sidebar.checkbox("⏱️ Mesurer les performances", value=PROFILING_DEFAULT)
+    profiler = start_profiling(Profiler(context={'script': script}) if profiling_enabled else None)
+
+    # Téléversement de fichier
+    uploaded_file = st.file_uploader(
+        "📤 Téléversez votre fichier Excel",
+        type=['xlsx'],
+        help="Colonnes attendues: modèle, no de série, nombre_incidents, etc."
+    )
+
+    # Parc enregistré (facultatif) : chaque extraction y est fusionnée (seules
+    # les lignes nouvelles ou modifiées sont traitées) et le tableau de bord
+    # s'ouvre dessus sans téléversement
+    use_store = st.checkbox(
+        "📦 Fusionner dans le parc enregistré",
+        value=False,
+        help="Le parc cumule les extractions fusionnées : les numéros de série absents d'une extraction sont conservés. "
+             "Cochée sans fichier, ouvre le parc enregistré."
+    )
+    with st.sidebar.expander("📦 Parc enregistré", expanded=False):
+        store_extracts = store_history()
+        if store_extracts.empty:
+            st.caption("Aucune extraction fusionnée.")
+        else:
+            st.dataframe(
+                store_extracts[['fusionné_le', 'lignes', 'nouveaux', 'modifiés', 'inchangés']],
+                hide_index=True,
+                use_container_width=True
+            )
+            if st.button("🗑️ Vider le parc enregistré"):
+                clear_store()
+                st.rerun()
+    stored = load_store() if use_store and uploaded_file is None else None
+
+    if uploaded_file is not None or stored is not None:
+        try:
+            # Lire le fichier (mis en cache selon le hash de son contenu)
+            with stage("Chargement du fichier") as loading:
+                merge_report = None
+                if uploaded_file is None:
+                    df = stored
+                elif use_store:
+                    df, merge_report = merge_extract(uploaded_file)
+                else:
+                    df = load_fleet(uploaded_file)
+                loading.rows_out = len(df)
+            
+            # Afficher un message de succès
+            if uploaded_file is None:
+                st.success(f"Parc enregistré chargé ({len(df)} enregistrements)")
+            else:
+                st.success(f"Fichier chargé avec succès! ({len(df)} enregistrements)")
+            if merge_report is not None:
+                if merge_report['déjà_fusionné']:
+                    st.info("Extraction déjà fusionnée dans le parc")
+                else:
+                    st.info(
+                        f"Fusion : {merge_report['nouveaux']} nouveaux, {merge_report['modifiés']} modifiés, "
+                        f"{merge_report['inchangés']} inchangés"
+                    )
+            memory_report = df.attrs.get('memory_report')
+            if memory_report:
+                st.caption(
+                    f"Mémoire utilisée : {memory_report['before_mb']:.1f} Mo → {memory_report['after_mb']:.1f} Mo"
+                )
+            if df.attrs.get('serials_malformed'):
+                st.warning(
+                    f"{df.attrs['serials_malformed']} numéro(s) de série illisible(s) : date de fabrication inconnue"
+                )
+            
+            # ---------------------------------------------------------------------
+            # Filtres Avancés - Sidebar
+            # ---------------------------------------------------------------------
+            # Les index de filtrage sont construits une seule fois par fichier ;
+            # tous les filtres sont ensuite combinés en un seul masque.
+            engine = engine_for(df)
+            selected = {}
+            contains = {}
+            ranges = {}
+
+            st.sidebar.header("🔧 Filtres Avancés")
+            
+            # 1. Filtre Texte (Recherche)
+            st.sidebar.subheader("Recherche Textuelle")
+            
+            # Recherche par modèle
+            contains['modèle'] = st.sidebar.text_input("Recherche par modèle (ex: V01, VRS)")
+            
+            # Recherche par numéro de série
+            contains['no de série'] = st.sidebar.text_input(
+                "Recherche par numéro de série",
+                help="Plusieurs termes séparés par des espaces (tous requis) ou des virgules (l'un ou l'autre), `0119*` pour un préfixe"
+            )
+            
+            # 2. Filtres par Sélection
+            st.sidebar.subheader("Filtres par Sélection")
+            
+            # Filtre multi-sélection pour modèle
+            selected['modèle'] = st.sidebar.multiselect(
+                "Filtrer par modèle",
+                options=engine.options('modèle'),
+                default=None,
+                help="Sélectionnez un ou plusieurs modèles"
+            )
+            
+            # Filtre multi-sélection pour pays
+            if 'filiale' in df.columns:
+                selected['filiale'] = st.sidebar.multiselect(
+                    "Filtrer par filiale/pays",
+                    options=engine.options('filiale'),
+                    default=None
+                )
+            
+            # 3. Filtres Numériques
+            st.sidebar.subheader("Filtres Numériques")
+            
+            # Filtre par nombre d'incidents
+            if 'nombre_incidents' in df.columns:
+                low, high = engine.bounds('nombre_incidents')
+                ranges['nombre_incidents'] = st.sidebar.slider(
+                    "Nombre d'incidents",
+                    min_value=int(low),
+                    max_value=int(high),
+                    value=(0, int(high))
+                )
+            
+            # Filtre par nombre de retours
+            if 'nombre_retours' in df.columns:
+                low, high = engine.bounds('nombre_retours')
+                ranges['nombre_retours'] = st.sidebar.slider(
+                    "Nombre de retours SAV",
+                    min_value=int(low),
+                    max_value=int(high),
+                    value=(0, int(high))
+                )
+            
+            # 4. Filtres Temporels
+            st.sidebar.subheader("Filtres Temporels")
+            
+            # Filtre par date de fabrication
+            if 'Date de fabrication' in df.columns:
+                low, high = engine.bounds('Date de fabrication')
+                min_date = pd.Timestamp(low).to_pydatetime()
+                max_date = pd.Timestamp(high).to_pydatetime()
+                date_range = st.sidebar.date_input(
+                    "Période de fabrication",
+                    [min_date, max_date],
+                    min_value=min_date,
+                    max_value=max_date
+                )
+                if len(date_range) == 2:
+                    ranges['Date de fabrication'] = (date_range[0], date_range[1])
+            
+            # Agrégats depuis le cube pré-calculé quand les filtres s'y prêtent
+            df, summary, filter_state = apply_filters(df, selected, contains, ranges)
+            indicators = kpis(summary)
+            
+            # ---------------------------------------------------------------------
+            # Affichage des Résultats
+            # ---------------------------------------------------------------------
+            st.header("📊 Résultats Filtres")
+            
+            # Métriques clés
+            st.subheader("Indicateurs Clés")
+            cols = st.columns(4)
+            cols[0].metric("Produits filtrés", indicators['nb_produits'])
+            cols[1].metric("Incidents totaux", indicators['nombre_incidents'])
+            if 'nombre_retours' in indicators:
+                cols[2].metric("Retours SAV", indicators['nombre_retours'])
+            if 'délai_premier_incident' in indicators:
+                cols[3].metric("Délai moyen avant incident", f"{indicators['délai_premier_incident']:.1f} jours")
+            
+            # Visualisation des données filtrées
+            tab1, tab2 = st.tabs(["📋 Données Brutes", "📈 Visualisations"])
+            
+            with tab1:
+                # Affichage paginé : seule la page visible est triée et envoyée
+                sort_cols = st.columns(4)
+                columns = list(df.columns)
+                sort_col = sort_cols[0].selectbox(
+                    "Trier par",
+                    columns,
+                    index=columns.index('nombre_incidents') if 'nombre_incidents' in columns else 0
+                )
+                ascending = sort_cols[1].radio("Ordre", ["Décroissant", "Croissant"], horizontal=True) == "Croissant"
+                page_size = sort_cols[2].selectbox("Lignes par page", [100, 500, 1000, 5000], index=1)
+                n_pages = page_count(len(df), page_size)
+                page_number = sort_cols[3].number_input("Page", min_value=1, max_value=n_pages, value=1, step=1)
+                
+                with stage("Table paginée", rows_in=len(df)):
+                    st.dataframe(
+                        page(df, filter_state, sort_col, ascending, int(page_number) - 1, page_size),
+                        column_config={
+                            "Date de fabrication": st.column_config.DateColumn("Fabriqué le"),
+                            "date d\'installation": st.column_config.DateColumn("Installé le")
+                        },
+                        hide_index=True,
+                        use_container_width=True,
+                        height=500
+                    )
+                first_row = (int(page_number) - 1) * page_size
+                st.caption(f"Lignes {min(first_row + 1, len(df))}–{min(first_row + page_size, len(df))} sur {len(df)}")
+                
+                # Bouton d'export (fichier construit à la demande, réutilisé tant que
+                # les filtres ne changent pas)
+                export_cols = st.columns(2)
+                export_format = export_cols[0].selectbox("Format d'export", list(EXPORT_FORMATS))
+                export_path = cached_export(filter_state, export_format)
+                if export_path is None and export_cols[1].button("⚙️ Préparer l'export"):
+                    with st.spinner("Préparation du fichier..."):
+                        export_path = build_export(df, filter_state, export_format)
+                if export_path is not None:
+                    with open(export_path, 'rb') as export_data:
+                        st.download_button(
+                            label=f"📥 Exporter les données filtrées ({export_format})",
+                            data=export_data,
+                            file_name=export_file_name(export_format),
+                            mime=export_mime(export_format)
+                        )
+
+            
+            with tab2:
+                # Graphique 1: Répartition des incidents par modèle
+                with stage("Graphique incidents par modèle"):
+                    fig1 = px.bar(
+                        totals(summary, 'modèle', 'nombre_incidents'),
+                        x='modèle',
+                        y='nombre_incidents',
+                        title='Incidents totaux par Modèle',
+                        color='modèle'
+                    )
+                    st.plotly_chart(fig1, use_container_width=True)
+                
+                # Graphique 2: Délai avant premier incident
+                if 'délai_premier_incident' in df.columns:
+                    # Quartiles et moustaches calculés côté serveur
+                    with stage("Graphique délai avant incident", rows_in=len(df)):
+                        delay_summary, delay_outliers = box_summary(df, 'modèle', 'délai_premier_incident')
+                        fig2 = box_figure(
+                            delay_summary,
+                            delay_outliers,
+                            'modèle',
+                            'délai_premier_incident',
+                            title='Délai avant Premier Incident (jours) par Modèle'
+                        )
+                        st.plotly_chart(fig2, use_container_width=True)
+                        
+                        # Répartition tous modèles confondus (classes calculées côté serveur)
+                        delay_counts, delay_edges = histogram_bins(df['délai_premier_incident'])
+                        fig_delay = histogram_figure(
+                            delay_counts,
+                            delay_edges,
+                            title='Répartition du Délai avant Premier Incident',
+                            xaxis_title='Jours'
+                        )
+                        st.plotly_chart(fig_delay, use_container_width=True)
+                
+                # Graphique 3: Fiabilité (Kaplan-Meier : les produits sans incident
+                # sont censurés à leur dernière connexion)
+                if all(col in df.columns for col in [INSTALL_COL, LAST_SEEN_COL]):
+                    with stage("Graphiques de fiabilité", rows_in=len(df)):
+                        curves, _ = reliability(df, filter_state, ['modèle'])
+                        fig_km = survival_figure(
+                            step_points(curves, ['modèle']),
+                            ['modèle'],
+                            title='Fiabilité (part des produits sans incident) par Modèle'
+                        )
+                        st.plotly_chart(fig_km, use_container_width=True)
+                        
+                        # Cohortes modèle × mois de fabrication
+                        _, cohorts = reliability(df, filter_state, COHORT_DIMS)
+                        if MONTH_DIM in cohorts.columns:
+                            indicator = st.selectbox(
+                                "Indicateur par cohorte",
+                                [f'fiabilité_{h}j' for h in HORIZONS] + ['taux_pour_100_an'],
+                                help="taux_pour_100_an : incidents pour 100 produits-années de suivi"
+                            )
+                            fig_cohorts = cohort_heatmap(
+                                cohorts,
+                                'modèle',
+                                MONTH_DIM,
+                                indicator,
+                                title='Cohortes par Modèle et Mois de fabrication'
+                            )
+                            st.plotly_chart(fig_cohorts, use_container_width=True)
+                
+                # Graphique 4: Carte géographique (si données disponibles)
+                if 'filiale' in df.columns:
+                    with stage("Carte par filiale"):
+                        geo_data = totals(summary, 'filiale', 'nombre_incidents')
+                        fig3 = px.choropleth(
+                            geo_data,
+                            locations='filiale',
+                            locationmode='country names',
+                            color='nombre_incidents',
+                            hover_name='filiale',
+                            title='Incidents par Pays/Filiale'
+                        )
+                        st.plotly_chart(fig3, use_container_width=True)
+        
+        except Exception as e:
+            st.error(f"Erreur lors du traitement: {str(e)}")
+    else:
+        st.info("Veuillez téléverser un fichier Excel pour commencer l'analyse")
+        st.markdown("""
+        **Colonnes attendues:**
+        - modèle (V01, V01KB...)
+        - no de série
+        - filiale (pays)
+        - date d'installation
+        - nombre_incidents
+        - nombre_retours
+        """)
+
+    # Instructions
+    with st.expander("ℹ️ Mode d'emploi des filtres"):
+        st.markdown("""
+        **1. Recherche Textuelle:**
+        - Tapez un terme pour filtrer les modèles ou numéros de série
+        
+        **2. Filtres par Sélection:**
+        - Choisissez un ou plusieurs modèles/pays
+        
+        **3. Filtres Numériques:**
+        - Sélectionnez une plage d'incidents ou retours
+        
+        **4. Filtres Temporels:**
+        - Définissez une période de fabrication
+        
+        **Astuce:** Combinez plusieurs filtres pour affiner votre analyse!
+        """)
+
+    # Panneau des mesures de performance
+    stop_profiling()
+    if profiler is not None:
+        with st.sidebar.expander("⏱️ Performances", expanded=False):
+            st.dataframe(profiler.to_frame(), hide_index=True, use_container_width=True)
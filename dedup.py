@@ -0,0 +1,123 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+# -----------------------------
+# Regroupement des quasi-doublons (MinHash + LSH)
+# -----------------------------
+# Chaque texte prétraité est découpé en 5-grammes d'octets UTF-8 ; sa
+# signature MinHash (NUM_PERM minimums de hachages aléatoires) estime la
+# similarité de Jaccard entre deux textes. Les signatures sont découpées en
+# BANDS bandes : deux textes qui partagent une bande entière sont candidats,
+# puis retenus si leur similarité estimée atteint THRESHOLD. Les groupes sont
+# les composantes connexes de ces paires. Tout est vectorisé et linéaire en
+# nombre de textes.
+#
+# Seul un représentant par groupe (avec son effectif comme poids) est
+# vectorisé et regroupé ; les étiquettes sont ensuite recopiées sur toutes
+# les lignes du groupe.
+
+SHINGLE = 5
+NUM_PERM = 64
+BANDS = 8          # 8 bandes de 8 lignes : seuil de candidature ~0.77
+THRESHOLD = 0.8
+SEED = 42
+
+
+def _shingles(texts):
+    # Retourne (clés des 5-grammes, début de chaque texte dans les clés)
+    encoded = [text.encode('utf-8') for text in texts]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    # Chaque texte est suivi de SHINGLE octets nuls : un texte court (même
+    # vide) forme un seul 5-gramme complété par des zéros, sans déborder sur
+    # le texte suivant
+    padding = b'\0' * SHINGLE
+    buffer = np.frombuffer(b''.join(b + padding for b in encoded), dtype=np.uint8).astype(np.uint64)
+    starts = np.concatenate([[0], np.cumsum(lengths + SHINGLE)[:-1]])
+
+    keys = np.zeros(len(buffer) - SHINGLE + 1, dtype=np.uint64)
+    for j in range(SHINGLE):
+        keys |= buffer[j:len(buffer) - SHINGLE + 1 + j] << np.uint64(8 * j)
+
+    n_shingles = np.maximum(lengths - SHINGLE + 1, 1)
+    positions = np.repeat(starts, n_shingles) + (
+        np.arange(n_shingles.sum()) - np.repeat(np.cumsum(n_shingles) - n_shingles, n_shingles)
+    )
+    offsets = np.concatenate([[0], np.cumsum(n_shingles)[:-1]])
+    return keys[positions], offsets
+
+
+def minhash_signatures(texts, num_perm=NUM_PERM, seed=SEED):
+    # Matrice (textes x num_perm) de uint64
+    keys, offsets = _shingles(texts)
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 1 << 64, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 1 << 64, size=num_perm, dtype=np.uint64)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint64)
+    if len(texts) == 0:
+        return signatures
+    hashed = np.empty_like(keys)
+    for p in range(num_perm):
+        # Hachage multiplicatif : on garde les bits de poids fort (le
+        # débordement modulo 2**64 est voulu)
+        np.multiply(keys, a[p], out=hashed)
+        hashed += b[p]
+        hashed >>= np.uint64(32)
+        signatures[:, p] = np.minimum.reduceat(hashed, offsets)
+    return signatures
+
+
+def _band_keys(band):
+    # Une clé 64 bits par ligne de la bande
+    key = np.zeros(len(band), dtype=np.uint64)
+    for column in band.T:
+        key = (key ^ column) * np.uint64(0x100000001B3)
+    return key
+
+
+def near_duplicate_groups(texts, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+    # Numéro de groupe de chaque texte (0..n_groupes-1, dans l'ordre de
+    # première apparition)
+    n = len(texts)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    signatures = minhash_signatures(texts, num_perm)
+    rows = num_perm // bands
+
+    sources = []
+    targets = []
+    for band in range(bands):
+        keys = _band_keys(signatures[:, band * rows:(band + 1) * rows])
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        # Chaque texte est relié au premier texte de même clé de bande
+        first = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        leader = order[np.maximum.accumulate(np.where(first, np.arange(n), 0))]
+        linked = leader != order
+        sources.append(order[linked])
+        targets.append(leader[linked])
+
+    sources = np.concatenate(sources)
+    targets = np.concatenate(targets)
+    if len(sources):
+        # Vérification des candidats par la similarité estimée
+        similarity = (signatures[sources] == signatures[targets]).mean(axis=1)
+        keep = similarity >= threshold
+        sources, targets = sources[keep], targets[keep]
+
+    graph = coo_matrix((np.ones(len(sources), dtype=np.int8), (sources, targets)), shape=(n, n))
+    _, components = connected_components(graph, directed=False)
+    # Renumérotation dans l'ordre de première apparition
+    _, first_index, inverse = np.unique(components, return_index=True, return_inverse=True)
+    rank = np.empty(len(first_index), dtype=np.int64)
+    rank[np.argsort(first_index)] = np.arange(len(first_index))
+    return rank[inverse]
+
+
+def collapse_near_duplicates(texts, threshold=THRESHOLD):
+    # Retourne (indices des représentants, groupe de chaque ligne, poids de
+    # chaque représentant). Le représentant est la première ligne du groupe.
+    groups = near_duplicate_groups(texts, threshold)
+    _, representatives = np.unique(groups, return_index=True)
+    weights = np.bincount(groups, minlength=len(representatives))
+    return representatives, groups, weights
@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# -----------------------------
+# Projection 2D des grands corpus
+# -----------------------------
+# Au-delà de quelques dizaines de milliers de points, un nuage de points est
+# lent à dessiner et illisible. Les coordonnées sont réparties une fois pour
+# toutes dans une grille fine GRID × GRID, par cluster (effectif de chaque
+# couple cellule × cluster non vide). L'affichage regroupe ensuite les
+# cellules de la zone visible en tuiles : effectif total et cluster
+# majoritaire. Changer de zoom ou de couleurs ne relit que la grille.
+#
+# Les points eux-mêmes ne sont dessinés que si la zone visible en contient
+# au plus MAX_POINTS.
+
+GRID = 512
+# Tuiles sur la plus grande dimension de la zone affichée
+DISPLAY_TILES = 128
+MAX_POINTS = 20_000
+MAX_CACHED_GRIDS = 8
+
+_grids = OrderedDict()
+_lock = threading.Lock()
+
+
+class DensityGrid:
+    def __init__(self, coords, labels, size=GRID):
+        coords = np.asarray(coords, dtype=np.float64)[:, :2]
+        self.size = size
+        self.clusters, codes = np.unique(np.asarray(labels), return_inverse=True)
+        if len(coords):
+            self.low, self.high = coords.min(axis=0), coords.max(axis=0)
+        else:
+            self.low, self.high = np.zeros(2), np.ones(2)
+        self.span = np.where(self.high > self.low, self.high - self.low, 1.0)
+
+        cells = self._cells(coords)
+        n_clusters = max(len(self.clusters), 1)
+        keys = (cells[:, 0] * size + cells[:, 1]) * n_clusters + codes.ravel()
+        keys, counts = np.unique(keys, return_counts=True)
+        # Couples (cellule, cluster) non vides
+        self.ix = keys // n_clusters // size
+        self.iy = keys // n_clusters % size
+        self.cluster = keys % n_clusters
+        self.count = counts
+
+    def _cells(self, coords):
+        return np.clip(((coords - self.low) / self.span * self.size).astype(np.int64), 0, self.size - 1)
+
+    def _window(self, x_range, y_range):
+        # Cellules [début, fin) couvrant la zone
+        low = np.array([x_range[0], y_range[0]], dtype=np.float64)
+        high = np.array([x_range[1], y_range[1]], dtype=np.float64)
+        start = np.clip(np.floor((low - self.low) / self.span * self.size), 0, self.size - 1).astype(np.int64)
+        stop = np.clip(np.ceil((high - self.low) / self.span * self.size), start + 1, self.size).astype(np.int64)
+        inside = (self.ix >= start[0]) & (self.ix < stop[0]) & (self.iy >= start[1]) & (self.iy < stop[1])
+        return start, stop, inside
+
+    def count_in(self, x_range, y_range):
+        # Nombre de points des cellules couvrant la zone (légère surestimation
+        # sur les bords)
+        _, _, inside = self._window(x_range, y_range)
+        return int(self.count[inside].sum())
+
+    def tiles(self, x_range, y_range, n_tiles=DISPLAY_TILES):
+        # Tuiles de la zone : effectif total et code du cluster majoritaire
+        # (-1 si vide), tableaux (lignes = y, colonnes = x), avec l'origine et
+        # la taille d'une tuile en coordonnées de la projection
+        start, stop, inside = self._window(x_range, y_range)
+        factor = max(1, int(np.ceil((stop - start).max() / n_tiles)))
+        width, height = -(-(stop - start) // factor)
+        tx = (self.ix[inside] - start[0]) // factor
+        ty = (self.iy[inside] - start[1]) // factor
+        tile = ty * width + tx
+        counts = self.count[inside]
+
+        total = np.bincount(tile, weights=counts, minlength=width * height)
+        dominant = np.full(width * height, -1, dtype=np.int64)
+        cell = self.span / self.size
+        result = {
+            'total': total.reshape(height, width),
+            'dominant': dominant.reshape(height, width),
+            'origin': self.low + start * cell,
+            'step': cell * factor,
+        }
+        if len(tile) == 0:
+            return result
+
+        n_clusters = max(len(self.clusters), 1)
+        keys, inverse = np.unique(tile * n_clusters + self.cluster[inside], return_inverse=True)
+        sums = np.bincount(inverse, weights=counts)
+        # Cluster majoritaire : dernière ligne de chaque tuile après tri par effectif
+        order = np.lexsort((sums, keys // n_clusters))
+        last = np.r_[(keys[order][1:] // n_clusters) != (keys[order][:-1] // n_clusters), True]
+        dominant[keys[order][last] // n_clusters] = keys[order][last] % n_clusters
+        return result
+
+
+def grid_for(key, coords, labels):
+    # Grille d'un résultat de clustering, calculée une fois. `key` doit
+    # identifier le résultat lui-même (exécution et date de fin), pas seulement
+    # les paramètres
+    with _lock:
+        grid = _grids.get(key)
+        if grid is not None:
+            _grids.move_to_end(key)
+            return grid
+    grid = DensityGrid(coords, labels)
+    with _lock:
+        _grids[key] = grid
+        _grids.move_to_end(key)
+        while len(_grids) > MAX_CACHED_GRIDS:
+            _grids.popitem(last=False)
+    return grid
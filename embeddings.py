@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from cache_paths import CACHE_ROOT, FileLock
+from nlp_resources import SBERT_MODEL, get_sbert
+
+# -----------------------------
+# Stockage persistant des vecteurs Sentence-BERT
+# -----------------------------
+# Un dossier par modèle, contenant :
+#   vectors.bin  matrice (n, dim) en float32 ou float16, ajout en fin de fichier
+#   keys.bin     empreinte 64 bits du texte prétraité de chaque ligne
+#   meta.json    dimension et type des vecteurs
+#
+# La matrice est ouverte en np.memmap : les vecteurs déjà calculés sont lus
+# sans copie, depuis n'importe quelle session ou processus. Seuls les textes
+# jamais vus sont encodés, par lots, et ajoutés au fichier au fil de l'eau.
+# Les vecteurs sont écrits avant les clés : une ligne n'est visible qu'une
+# fois sa clé écrite, un arrêt brutal ne laisse donc pas d'entrée tronquée.
+
+EMBEDDING_DIR = os.environ.get(
+    "DONNEES_EMBEDDING_DIR",
+    os.path.join(CACHE_ROOT, "embeddings"),
+)
+EMBEDDING_DTYPE = os.environ.get("DONNEES_EMBEDDING_DTYPE", "float32")
+# Textes encodés entre deux écritures sur disque
+ENCODE_CHUNK = 1024
+ENCODE_BATCH_SIZE = 64
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def text_keys(texts):
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little') for text in texts),
+        dtype=np.uint64,
+        count=len(texts),
+    )
+
+
+class EmbeddingStore:
+    def __init__(self, model_name, directory=EMBEDDING_DIR, dtype=EMBEDDING_DTYPE):
+        self.model_name = model_name
+        self.directory = os.path.join(directory, re.sub(r"[^\w.-]+", "_", model_name))
+        os.makedirs(self.directory, exist_ok=True)
+        self.vectors_path = os.path.join(self.directory, "vectors.bin")
+        self.keys_path = os.path.join(self.directory, "keys.bin")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.lock_path = os.path.join(self.directory, ".lock")
+
+        self.dim = None
+        self.dtype = np.dtype(dtype)
+        self._load_meta()
+
+        self._lock = threading.Lock()
+        # (nombre de lignes, clés triées, ordre de tri, matrice) : remplacé
+        # d'un bloc pour que les lectures concurrentes restent cohérentes
+        self._state = (0, np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64), None)
+
+    def _load_meta(self):
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            self.dim = meta['dim']
+            self.dtype = np.dtype(meta['dtype'])
+
+    def __len__(self):
+        return self._refresh()[0]
+
+    def _refresh(self):
+        # Relit les clés si un autre processus (ou session) en a ajouté
+        count = os.path.getsize(self.keys_path) // 8 if os.path.exists(self.keys_path) else 0
+        state = self._state
+        if count == state[0]:
+            return state
+        with self._lock:
+            if count == self._state[0]:
+                return self._state
+            if self.dim is None:
+                self._load_meta()
+            keys = np.fromfile(self.keys_path, dtype=np.uint64, count=count)
+            order = np.argsort(keys, kind='stable')
+            matrix = np.memmap(self.vectors_path, dtype=self.dtype, mode='r', shape=(count, self.dim))
+            self._state = (count, keys[order], order, matrix)
+            return self._state
+
+    def lookup(self, keys):
+        # Ligne de chaque clé dans la matrice, -1 si absente
+        count, sorted_keys, order, _ = self._refresh()
+        keys = np.asarray(keys, dtype=np.uint64)
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        if count == 0 or len(keys) == 0:
+            return rows
+        pos = np.minimum(np.searchsorted(sorted_keys, keys), count - 1)
+        found = sorted_keys[pos] == keys
+        rows[found] = order[pos[found]]
+        return rows
+
+    @property
+    def matrix(self):
+        return self._refresh()[3]
+
+    def add(self, keys, vectors):
+        keys = np.asarray(keys, dtype=np.uint64)
+        vectors = np.asarray(vectors)
+        if len(keys) == 0:
+            return
+        with FileLock(self.lock_path):
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, 'w', encoding='utf-8') as f:
+                    json.dump({'model': self.model_name, 'dim': self.dim, 'dtype': self.dtype.name}, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Dimension {vectors.shape[1]} différente de celle du stockage ({self.dim})")
+
+            # Un autre processus a pu encoder les mêmes textes entre-temps
+            new = self.lookup(keys) < 0
+            keys, vectors = keys[new], vectors[new]
+            if len(keys) == 0:
+                return
+
+            # Fichier des vecteurs ramené à la dernière ligne validée
+            with open(self.vectors_path, 'ab') as f:
+                f.truncate(len(self) * self.dim * self.dtype.itemsize)
+                f.write(np.ascontiguousarray(vectors, dtype=self.dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.keys_path, 'ab') as f:
+                f.write(keys.tobytes())
+        self._refresh()
+
+
+def store_for(model_name=SBERT_MODEL):
+    with _stores_lock:
+        store = _stores.get(model_name)
+        if store is None:
+            store = EmbeddingStore(model_name)
+            _stores[model_name] = store
+        return store
+
+
+def encode_texts(texts, model_name=SBERT_MODEL, batch_size=ENCODE_BATCH_SIZE, store=True):
+    # Vecteurs (float32) des textes prétraités, en n'encodant que les inédits.
+    # store=False : les inédits ne sont pas ajoutés au stockage (requêtes
+    # ponctuelles de la recherche d'incidents similaires)
+    storage = store_for(model_name)
+    keys = text_keys(texts)
+    rows = storage.lookup(keys)
+
+    missing = {}
+    for i in np.flatnonzero(rows < 0):
+        missing.setdefault(keys[i], texts[i])
+    if missing and not store:
+        missing_keys = list(missing)
+        fresh = get_sbert(model_name).encode(list(missing.values()), batch_size=batch_size, convert_to_numpy=True)
+        vectors = np.empty((len(texts), fresh.shape[1]), dtype=np.float32)
+        found = rows >= 0
+        vectors[found] = storage.matrix[rows[found]]
+        position = {key: i for i, key in enumerate(missing_keys)}
+        vectors[~found] = fresh[[position[key] for key in keys[~found]]]
+        return vectors
+    if missing:
+        model = get_sbert(model_name)
+        missing_keys = np.fromiter(missing.keys(), dtype=np.uint64, count=len(missing))
+        missing_texts = list(missing.values())
+        for start in range(0, len(missing_texts), ENCODE_CHUNK):
+            chunk = missing_texts[start:start + ENCODE_CHUNK]
+            vectors = model.encode(chunk, batch_size=batch_size, convert_to_numpy=True)
+            storage.add(missing_keys[start:start + ENCODE_CHUNK], vectors)
+        rows = storage.lookup(keys)
+
+    if len(texts) == 0:
+        return np.zeros((0, storage.dim or 0), dtype=np.float32)
+    return np.asarray(storage.matrix[rows], dtype=np.float32)
@@ -0,0 +1,105 @@
+import gzip
+import os
+
+import pandas as pd
+
+from cache_paths import CACHE_ROOT
+from instrumentation import stage
+
+# -----------------------------
+# Export des données filtrées
+# -----------------------------
+# Le fichier n'est construit que lorsque l'utilisateur le demande, par blocs
+# de lignes écrits directement sur disque (pas de copie complète du CSV en
+# mémoire). Il est rangé sous l'identifiant de l'état des filtres : tant que
+# les filtres ne changent pas, le fichier déjà construit est réutilisé.
+
+EXPORT_DIR = os.path.join(CACHE_ROOT, "exports")
+CHUNK_ROWS = 100_000
+MAX_EXPORTS = 20
+EXCEL_MAX_ROWS = 1_048_575
+
+
+def _write_csv_gz(df, path):
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+        for start in range(0, max(len(df), 1), CHUNK_ROWS):
+            df.iloc[start:start + CHUNK_ROWS].to_csv(f, index=False, header=start == 0)
+
+
+def _write_parquet(df, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    with pq.ParquetWriter(path, schema) as writer:
+        for start in range(0, len(df), CHUNK_ROWS):
+            chunk = df.iloc[start:start + CHUNK_ROWS]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def _write_xlsx(df, path):
+    if len(df) > EXCEL_MAX_ROWS:
+        raise ValueError(f"Trop de lignes pour Excel ({len(df)} > {EXCEL_MAX_ROWS}), utilisez CSV ou Parquet")
+    with pd.ExcelWriter(path) as writer:
+        for start in range(0, max(len(df), 1), CHUNK_ROWS):
+            df.iloc[start:start + CHUNK_ROWS].to_excel(
+                writer,
+                index=False,
+                header=start == 0,
+                startrow=start + 1 if start else 0,
+            )
+
+
+# Libellé -> (extension, type MIME, fonction d'écriture)
+EXPORT_FORMATS = {
+    "CSV (gzip)": ("csv.gz", "application/gzip", _write_csv_gz),
+    "Parquet": ("parquet", "application/vnd.apache.parquet", _write_parquet),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", _write_xlsx),
+}
+
+
+def _export_path(state_key, fmt):
+    extension = EXPORT_FORMATS[fmt][0]
+    return os.path.join(EXPORT_DIR, f"{state_key}.{extension}")
+
+
+def cached_export(state_key, fmt):
+    path = _export_path(state_key, fmt)
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+    return None
+
+
+def build_export(df, state_key, fmt):
+    path = _export_path(state_key, fmt)
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    # Fichier temporaire : même extension (pandas choisit le moteur Excel d'après elle)
+    tmp_path = os.path.join(EXPORT_DIR, ".tmp-" + os.path.basename(path))
+    try:
+        with stage(f"Export {fmt}", rows_in=len(df)):
+            EXPORT_FORMATS[fmt][2](df, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _evict_exports()
+    return path
+
+
+def _evict_exports():
+    files = [os.path.join(EXPORT_DIR, name) for name in os.listdir(EXPORT_DIR) if not name.startswith(".tmp-")]
+    files.sort(key=os.path.getmtime)
+    for path in files[:-MAX_EXPORTS]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def export_file_name(fmt):
+    return f"donnees_filtrees.{EXPORT_FORMATS[fmt][0]}"
+
+
+def export_mime(fmt):
+    return EXPORT_FORMATS[fmt][1]
@@ -0,0 +1,218 @@
+import hashlib
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from ingestion import sidecar_path
+from instrumentation import stage
+from search_index import NgramIndex, load_or_build
+
+# -----------------------------
+# Moteur de filtres
+# -----------------------------
+# Construit une seule fois par jeu de données. Les filtres de la barre
+# latérale sont combinés dans un seul masque booléen, sans DataFrame
+# intermédiaire :
+# - colonnes catégorielles : un bitmap compressé (np.packbits) par catégorie,
+#   les catégories sélectionnées sont combinées par OU ;
+# - colonnes numériques et dates : valeurs triées + permutation, les bornes
+#   d'un intervalle sont trouvées par recherche dichotomique ;
+# - recherche textuelle : index de trigrammes (voir search_index.py), sur les
+#   numéros de série et sur les libellés des catégories.
+
+CATEGORY_COLS = ['modèle', 'filiale']
+RANGE_COLS = ['nombre_incidents', 'nombre_retours', 'Date de fabrication']
+TEXT_COLS = ['no de série']
+
+
+def text_index_path(df, col):
+    # Fichier de l'index n-grammes de la colonne `col`, à côté du jeu de données
+    return sidecar_path(df, f"{col.replace(' ', '_')}.ngram.npz")
+
+
+class FilterEngine:
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.dataset_key = df.attrs.get('cache_key', str(id(df)))
+        self.categories = {}
+        self.codes = {}
+        self.bitmaps = {}
+        self.sorted_values = {}
+        self.orders = {}
+        self.null_rows = {}
+        self.text_indexes = {}
+        self.category_indexes = {}
+
+        for col in CATEGORY_COLS:
+            if col in df.columns:
+                self._index_category(col, df[col])
+        for col in RANGE_COLS:
+            if col in df.columns:
+                self._index_range(col, df[col])
+        for col in TEXT_COLS:
+            if col in df.columns:
+                self.text_indexes[col] = load_or_build(df[col], text_index_path(df, col))
+
+    def _index_category(self, col, series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            categories = series.cat.categories
+        else:
+            codes, categories = pd.factorize(series, sort=True)
+        self.codes[col] = codes
+        self.categories[col] = pd.Index(categories)
+        self.bitmaps[col] = [np.packbits(codes == i) for i in range(len(categories))]
+        self.category_indexes[col] = NgramIndex(pd.Series(categories, dtype='string'))
+
+    def _index_range(self, col, series):
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = series.to_numpy()
+            nulls = np.isnat(values)
+        else:
+            values = series.to_numpy(dtype='float64', na_value=np.nan)
+            nulls = np.isnan(values)
+        order = np.flatnonzero(~nulls)
+        order = order[np.argsort(values[order], kind='stable')]
+        self.orders[col] = order
+        self.sorted_values[col] = values[order]
+        self.null_rows[col] = np.flatnonzero(nulls)
+
+    # -----------------------------
+    # Informations pour les widgets
+    # -----------------------------
+    def options(self, col):
+        return list(self.categories[col])
+
+    def bounds(self, col):
+        values = self.sorted_values[col]
+        if len(values) == 0:
+            return None, None
+        return values[0], values[-1]
+
+    # -----------------------------
+    # Prédicats
+    # -----------------------------
+    def _wanted_categories(self, col, selected=None, contains=None):
+        categories = self.categories[col]
+        wanted = np.zeros(len(categories), dtype=bool)
+        if selected:
+            wanted |= categories.isin(selected)
+        else:
+            wanted[:] = True
+        if contains:
+            # La recherche porte sur les catégories (quelques dizaines), pas sur les lignes
+            found = np.zeros(len(categories), dtype=bool)
+            found[self.category_indexes[col].search(contains)] = True
+            wanted &= found
+        return wanted
+
+    def matching_categories(self, col, selected=None, contains=None):
+        # Libellés retenus par les filtres, None si toutes les catégories le sont
+        wanted = self._wanted_categories(col, selected, contains)
+        if wanted.all():
+            return None
+        return list(self.categories[col][wanted])
+
+    def _category_mask(self, col, selected=None, contains=None):
+        wanted = self._wanted_categories(col, selected, contains)
+        if wanted.all():
+            return None
+        packed = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        for i in np.flatnonzero(wanted):
+            packed |= self.bitmaps[col][i]
+        return np.unpackbits(packed, count=self.n_rows).view(bool)
+
+    def _range_mask(self, col, low, high):
+        values = self.sorted_values[col]
+        order = self.orders[col]
+        if np.issubdtype(values.dtype, np.datetime64):
+            low = np.datetime64(pd.Timestamp(low)).astype(values.dtype)
+            high = np.datetime64(pd.Timestamp(high)).astype(values.dtype)
+        start = np.searchsorted(values, low, side='left')
+        stop = np.searchsorted(values, high, side='right')
+
+        if start == 0 and stop == len(values) and len(self.null_rows[col]) == 0:
+            return None
+        if stop - start > len(values) // 2:
+            # Intervalle large : on retire les lignes hors intervalle
+            mask = np.ones(self.n_rows, dtype=bool)
+            mask[order[:start]] = False
+            mask[order[stop:]] = False
+            mask[self.null_rows[col]] = False
+        else:
+            mask = np.zeros(self.n_rows, dtype=bool)
+            mask[order[start:stop]] = True
+        return mask
+
+    def _text_mask(self, col, query):
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.text_indexes[col].search(query)] = True
+        return mask
+
+    def mask(self, selected=None, contains=None, ranges=None):
+        # selected : {colonne: [valeurs]}, contains : {colonne: texte},
+        # ranges : {colonne: (min, max)} (bornes incluses)
+        selected = {k: v for k, v in (selected or {}).items() if v}
+        contains = {k: v for k, v in (contains or {}).items() if v}
+        ranges = ranges or {}
+
+        masks = []
+        for col in self.categories:
+            if col in selected or col in contains:
+                with stage(f"Filtre {col}"):
+                    masks.append(self._category_mask(col, selected.get(col), contains.get(col)))
+        for col, query in contains.items():
+            if col in self.text_indexes:
+                with stage(f"Recherche {col}"):
+                    masks.append(self._text_mask(col, query))
+        for col, (low, high) in ranges.items():
+            if col in self.sorted_values:
+                with stage(f"Filtre {col}"):
+                    masks.append(self._range_mask(col, low, high))
+
+        result = None
+        for mask in masks:
+            if mask is None:
+                continue
+            result = mask if result is None else np.logical_and(result, mask, out=result)
+        if result is None:
+            return np.ones(self.n_rows, dtype=bool)
+        return result
+
+    def state_key(self, selected=None, contains=None, ranges=None):
+        # Identifiant de l'état des filtres (pour les caches de tri, d'export...)
+        state = (
+            self.dataset_key,
+            sorted((k, list(v)) for k, v in (selected or {}).items() if v),
+            sorted((k, v) for k, v in (contains or {}).items() if v),
+            sorted((k, tuple(str(x) for x in v)) for k, v in (ranges or {}).items()),
+        )
+        return hashlib.sha1(repr(state).encode('utf-8')).hexdigest()
+
+    def apply(self, df, **predicates):
+        mask = self.mask(**predicates)
+        if mask.all():
+            return df
+        return df[mask]
+
+
+_engines = {}
+_lock = threading.Lock()
+
+
+def engine_for(df):
+    # Un moteur par DataFrame chargé (les DataFrames ne sont pas hachables,
+    # on les identifie par id() en vérifiant qu'ils sont toujours vivants).
+    with _lock:
+        entry = _engines.get(id(df))
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+        for key in [k for k, (ref, _) in _engines.items() if ref() is None]:
+            del _engines[key]
+    with stage("Index de filtrage", rows_in=len(df)):
+        engine = FilterEngine(df)
+    with _lock:
+        _engines[id(df)] = (weakref.ref(df), engine)
+    return engine
@@ -0,0 +1,284 @@
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from cache_paths import CACHE_ROOT, FileLock
+from ingestion import CACHE_VERSION, load_raw, read_source
+from instrumentation import stage
+from cube import MetricsCube, cube_for, cube_table, remember_cube, update_table
+from filters import text_index_path
+from search_index import load_or_build
+
+# -----------------------------
+# Parc enregistré (fusion incrémentale des extractions)
+# -----------------------------
+# Les extractions mensuelles reprennent tout le parc alors que la plupart des
+# lignes n'ont pas changé. Le parc est conservé sur disque, une ligne par
+# numéro de série, et chaque nouvelle extraction y est fusionnée :
+# - un hash de chaque ligne brute repère les numéros nouveaux ou modifiés ;
+# - seules ces lignes passent par la fonction de traitement ;
+# - une ligne modifiée garde sa position, les nouvelles sont ajoutées en fin :
+#   l'index des numéros de série est complété au lieu d'être reconstruit, et
+#   le cube d'agrégats est mis à jour par différence.
+# Les numéros absents d'une extraction sont conservés (fusion, pas de
+# suppression).
+#
+# Fichiers d'une version v du parc :
+#   fleet.v.parquet  lignes traitées
+#   rows.v.npz       hash de la ligne brute et série illisible, par ligne
+#   cube.v.parquet   table du cube d'agrégats
+# meta.json (écrit en dernier) désigne la version courante ; un changement de
+# CACHE_VERSION (traitement modifié) repart d'un parc vide. Chaque parc reçoit
+# un identifiant aléatoire à sa création : les fichiers des autres modules
+# (index, exports...) d'un parc effacé ne sont jamais relus pour un nouveau.
+# Les fusions (tableau de bord, ligne de commande) sont sérialisées par un
+# verrou de fichier.
+
+STORE_DIR = os.environ.get("DONNEES_STORE_DIR", os.path.join(CACHE_ROOT, "store"))
+KEY_COL = 'no de série'
+DATE_COL = 'Date de fabrication'
+# Versions précédentes conservées (une session peut encore les lire)
+KEEP_VERSIONS = 1
+
+_current = None
+_lock = threading.Lock()
+
+
+def _path(name):
+    return os.path.join(STORE_DIR, name)
+
+
+def _read_meta():
+    try:
+        with open(_path("meta.json"), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('cache_version') != CACHE_VERSION or 'generation' not in meta:
+        return None
+    return meta
+
+
+def _write_meta(meta):
+    tmp_path = _path(".tmp-meta.json")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, _path("meta.json"))
+
+
+def _remove_old_versions(version):
+    for name in os.listdir(STORE_DIR):
+        match = re.match(r"(?:fleet|rows|cube)\.(\d+)\.", name)
+        # Y compris les versions d'un parc abandonné (CACHE_VERSION changé)
+        if match and not version - KEEP_VERSIONS <= int(match.group(1)) <= version:
+            try:
+                os.remove(_path(name))
+            except OSError:
+                pass
+
+
+def _finish(df, meta, malformed, table):
+    # Attributs et cube du parc, partagés avec les autres modules
+    df.attrs['cache_key'] = f"store.{meta['generation']}.{meta['version']}.v{CACHE_VERSION}"
+    df.attrs['serials_malformed'] = int(malformed.sum())
+    remember_cube(df, MetricsCube(df, table=table))
+    return df
+
+
+def _load_version(meta):
+    global _current
+    version = meta['version']
+    with _lock:
+        if _current is not None and _current[:2] == (meta['generation'], version):
+            return _current[1:]
+    with stage("Lecture du parc enregistré") as s:
+        df = pd.read_parquet(_path(f"fleet.{version}.parquet"))
+        with np.load(_path(f"rows.{version}.npz")) as data:
+            row_hash, malformed = data['row_hash'], data['malformed']
+        table = pd.read_parquet(_path(f"cube.{version}.parquet"))
+        s.rows_out = len(df)
+    current = (version, _finish(df, meta, malformed, table), row_hash, malformed)
+    with _lock:
+        _current = (meta['generation'],) + current
+    return current
+
+
+def load_store():
+    # Parc enregistré (DataFrame traité), None s'il n'existe pas encore. Comme
+    # pour load_excel, le DataFrame est partagé : ne pas le modifier en place.
+    meta = _read_meta()
+    if meta is None:
+        return None
+    try:
+        return _load_version(meta)[1]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def store_history():
+    # Extractions fusionnées dans le parc, de la plus ancienne à la plus récente
+    meta = _read_meta()
+    return pd.DataFrame(meta['extracts'] if meta else [])
+
+
+def _row_hashes(raw):
+    return pd.util.hash_pandas_object(raw.astype('string'), index=False).to_numpy()
+
+
+def _prepare(raw):
+    # Numéros de série normalisés, lignes sans numéro retirées ; pour un
+    # numéro présent plusieurs fois, la dernière ligne l'emporte
+    if KEY_COL not in raw.columns:
+        raise ValueError(f"Colonne « {KEY_COL} » absente : l'extraction ne peut pas être fusionnée")
+    serials = raw[KEY_COL].astype('string').str.strip()
+    present = (serials.notna() & (serials != '')).to_numpy(dtype=bool)
+    keep = present & ~serials.duplicated(keep='last').to_numpy()
+    raw = raw[keep].reset_index(drop=True)
+    raw[KEY_COL] = serials[keep].reset_index(drop=True)
+    return raw, int((~present).sum()), int((present & ~keep).sum())
+
+
+def _align_categories(old, delta):
+    # Catégories communes, pour que la concaténation reste catégorielle
+    for col in old.columns.intersection(delta.columns):
+        if isinstance(old[col].dtype, pd.CategoricalDtype) and isinstance(delta[col].dtype, pd.CategoricalDtype):
+            categories = old[col].cat.categories.union(delta[col].cat.categories)
+            old = old.assign(**{col: old[col].cat.set_categories(categories)})
+            delta = delta.assign(**{col: delta[col].cat.set_categories(categories)})
+    return old, delta
+
+
+def _storable(df):
+    # Colonnes Excel mélangeant nombres et textes : conservées en texte pour
+    # que pyarrow puisse les écrire
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].astype('string')
+    return df
+
+
+def merge_extract(source, process_fn):
+    # Fusionne une extraction (fichier téléversé, chemin ou contenu binaire)
+    # dans le parc. Retourne (parc fusionné, rapport de fusion).
+    global _current
+    data, file_key = read_source(source)
+    os.makedirs(STORE_DIR, exist_ok=True)
+    with FileLock(_path(".lock")):
+        meta = _read_meta()
+        for entry in (meta or {}).get('extracts', []):
+            if entry['fichier'] == file_key:
+                return _load_version(meta)[1], {**entry, 'déjà_fusionné': True}
+
+        if meta is not None:
+            version, old, old_hash, old_malformed = _load_version(meta)
+        else:
+            meta = {'version': 0, 'generation': os.urandom(8).hex(), 'cache_version': CACHE_VERSION, 'extracts': []}
+            version, old, old_hash, old_malformed = 0, None, np.zeros(0, np.uint64), np.zeros(0, bool)
+
+        raw, n_missing, n_duplicates = _prepare(load_raw(data, file_key))
+        with stage("Comparaison avec le parc", rows_in=len(raw)) as s:
+            row_hash = _row_hashes(raw)
+            if old is None:
+                positions = np.full(len(raw), -1, dtype=np.int64)
+            else:
+                positions = pd.Index(old[KEY_COL]).get_indexer(raw[KEY_COL])
+            new = positions < 0
+            changed = ~new
+            changed[changed] = old_hash[positions[changed]] != row_hash[changed]
+            delta_rows = np.flatnonzero(new | changed)
+            s.rows_out = len(delta_rows)
+
+        report = {
+            'fichier': file_key,
+            'fusionné_le': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'lignes': len(raw),
+            'nouveaux': int(new.sum()),
+            'modifiés': int(changed.sum()),
+            'inchangés': int(len(raw) - len(delta_rows)),
+            'sans_numéro': n_missing,
+            'doublons': n_duplicates,
+        }
+        if len(delta_rows) == 0:
+            meta['extracts'].append(report)
+            _write_meta(meta)
+            return old, {**report, 'déjà_fusionné': False}
+
+        with stage("Traitement des lignes nouvelles ou modifiées", rows_in=len(delta_rows)) as s:
+            delta = process_fn(raw.iloc[delta_rows].reset_index(drop=True))
+            s.rows_out = len(delta)
+        # Série illisible : date de fabrication décodée du numéro introuvable
+        if DATE_COL not in raw.columns and DATE_COL in delta.columns:
+            delta_malformed = delta[KEY_COL].notna().to_numpy(dtype=bool) & delta[DATE_COL].isna().to_numpy()
+        else:
+            delta_malformed = np.zeros(len(delta), dtype=bool)
+
+        with stage("Fusion dans le parc", rows_in=len(delta)) as s:
+            delta_new = new[delta_rows]
+            replaced = positions[delta_rows[~delta_new]]
+            if old is None:
+                merged = delta
+                merged_hash = row_hash[delta_rows]
+                malformed = delta_malformed
+                removed = None
+            else:
+                stored = old
+                old, delta = _align_categories(old, delta)
+                # Lignes modifiées à leur ancienne position, nouvelles en fin
+                take = np.arange(len(old))
+                take[replaced] = len(old) + np.flatnonzero(~delta_new)
+                take = np.r_[take, len(old) + np.flatnonzero(delta_new)]
+                merged = pd.concat([old, delta], ignore_index=True).take(take).reset_index(drop=True)
+                merged_hash = np.r_[old_hash, row_hash[delta_rows]][take]
+                malformed = np.r_[old_malformed, delta_malformed][take]
+                removed = old.iloc[replaced]
+            merged.attrs = {}
+            merged = _storable(merged)
+            s.rows_out = len(merged)
+
+        with stage("Mise à jour du cube d'agrégats", rows_in=len(delta)):
+            if old is None:
+                table = cube_table(merged)
+            else:
+                table = update_table(cube_for(stored).table, added=delta, removed=removed)
+
+        version += 1
+        with stage("Écriture du parc", rows_in=len(merged)):
+            merged.to_parquet(_path(f"fleet.{version}.parquet"), index=False)
+            np.savez(_path(f"rows.{version}.npz"), row_hash=merged_hash, malformed=malformed)
+            table.to_parquet(_path(f"cube.{version}.parquet"), index=False)
+        meta['version'] = version
+        _finish(merged, meta, malformed, table)
+
+        with stage("Index des numéros de série", rows_in=len(delta)):
+            # Numéros existants inchangés (mêmes positions) : seules les
+            # lignes ajoutées en fin sont indexées
+            if old is None:
+                load_or_build(merged[KEY_COL], text_index_path(merged, KEY_COL))
+            else:
+                index = load_or_build(stored[KEY_COL], text_index_path(stored, KEY_COL))
+                index.extend(merged[KEY_COL]).save(text_index_path(merged, KEY_COL))
+
+        meta['extracts'].append(report)
+        _write_meta(meta)
+        _remove_old_versions(version)
+        with _lock:
+            _current = (meta['generation'], version, merged, merged_hash, malformed)
+    return merged, {**report, 'déjà_fusionné': False}
+
+
+def clear_store():
+    # Efface le parc enregistré ; la prochaine fusion repart d'un parc vide
+    global _current
+    if not os.path.isdir(STORE_DIR):
+        return
+    with FileLock(_path(".lock")):
+        with _lock:
+            _current = None
+        for name in os.listdir(STORE_DIR):
+            if name != ".lock":
+                os.remove(_path(name))
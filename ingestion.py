@@ -0,0 +1,190 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from cache_paths import CACHE_ROOT
+from instrumentation import stage
+
+# -----------------------------
+# Cache d'ingestion des fichiers Excel
+# -----------------------------
+# Les fichiers téléversés sont identifiés par le hash de leur contenu : le
+# premier chargement lit le xlsx une seule fois, écrit une copie Parquet du
+# fichier brut (typée, colonnaire) ainsi que le DataFrame traité, puis les
+# rechargements (reruns Streamlit, nouveau téléversement du même fichier)
+# sont servis depuis la mémoire ou le disque.
+
+CACHE_DIR = os.environ.get(
+    "DONNEES_CACHE_DIR",
+    os.path.join(CACHE_ROOT, "ingestion"),
+)
+MAX_MEMORY_ENTRIES = int(os.environ.get("DONNEES_CACHE_MEMORY_ENTRIES", 4))
+MAX_DISK_BYTES = int(os.environ.get("DONNEES_CACHE_DISK_BYTES", 2 * 1024 ** 3))
+
+# À incrémenter quand le format des fichiers du cache ou le traitement change
+CACHE_VERSION = "3"
+
+# Fichiers gérés par le cache (copies Parquet, index de recherche...)
+SIDECAR_SUFFIXES = (".parquet", ".npz")
+
+_memory_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _read_bytes(uploaded_file):
+    if isinstance(uploaded_file, (bytes, bytearray)):
+        return bytes(uploaded_file)
+    if hasattr(uploaded_file, "getvalue"):
+        return uploaded_file.getvalue()
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        with open(uploaded_file, "rb") as f:
+            return f.read()
+    return uploaded_file.read()
+
+
+def _sidecar_paths(file_key, namespace):
+    base = os.path.join(CACHE_DIR, file_key)
+    return base + ".raw.parquet", f"{base}.{namespace}.v{CACHE_VERSION}.parquet"
+
+
+def _remember(key, df):
+    with _lock:
+        _memory_cache[key] = df
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MAX_MEMORY_ENTRIES:
+            _memory_cache.popitem(last=False)
+
+
+def _write_parquet(df, path):
+    # Certaines colonnes Excel mélangent nombres et textes : pyarrow refuse
+    # alors de les typer. Le cache disque est facultatif, on s'en passe.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    try:
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    _evict_disk()
+    return True
+
+
+def _read_parquet(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_parquet(path)
+    except Exception:
+        return None
+    # La date de modification sert d'horodatage LRU pour l'éviction
+    os.utime(path)
+    return df
+
+
+def _evict_disk():
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(SIDECAR_SUFFIXES):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= MAX_DISK_BYTES:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+def _load_raw(data, raw_path):
+    raw = _read_parquet(raw_path)
+    if raw is None:
+        with stage("Lecture Excel") as s:
+            raw = pd.read_excel(io.BytesIO(data))
+            s.rows_out = len(raw)
+        with stage("Écriture Parquet (brut)"):
+            _write_parquet(raw, raw_path)
+    return raw
+
+
+def read_source(uploaded_file):
+    # Contenu binaire du fichier et hash identifiant ce contenu
+    with stage("Hash du fichier"):
+        data = _read_bytes(uploaded_file)
+        return data, content_hash(data)
+
+
+def load_raw(data, file_key):
+    # Fichier brut (non traité), via sa copie Parquet quand elle existe
+    raw_path, _ = _sidecar_paths(file_key, "raw")
+    return _load_raw(data, raw_path)
+
+
+def load_excel(uploaded_file, process_fn, namespace="default"):
+    # `namespace` distingue les différentes fonctions de traitement (app, VF...)
+    # qui partagent la même copie brute du fichier.
+    # Le DataFrame retourné est partagé entre les reruns : ne pas le modifier
+    # en place (les filtres créent de nouveaux DataFrames).
+    data, file_key = read_source(uploaded_file)
+    key = (file_key, namespace)
+
+    with _lock:
+        df = _memory_cache.get(key)
+        if df is not None:
+            _memory_cache.move_to_end(key)
+            return df
+
+    raw_path, processed_path = _sidecar_paths(file_key, namespace)
+
+    with stage("Lecture du cache Parquet") as s:
+        df = _read_parquet(processed_path)
+        s.rows_out = None if df is None else len(df)
+    if df is None:
+        raw = _load_raw(data, raw_path)
+        with stage("Traitement des données", rows_in=len(raw)) as s:
+            df = process_fn(raw)
+            s.rows_out = len(df)
+        with stage("Écriture Parquet (traité)"):
+            _write_parquet(df, processed_path)
+
+    # Clé permettant aux autres modules de ranger leurs fichiers (index...)
+    # à côté de ceux du jeu de données
+    df.attrs['cache_key'] = f"{file_key}.{namespace}.v{CACHE_VERSION}"
+    _remember(key, df)
+    return df
+
+
+def sidecar_path(df, suffix):
+    cache_key = df.attrs.get('cache_key')
+    if cache_key is None:
+        return None
+    return os.path.join(CACHE_DIR, f"{cache_key}.{suffix}")
+
+
+def clear_cache(disk=False):
+    with _lock:
+        _memory_cache.clear()
+    if disk and os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            if name.endswith(SIDECAR_SUFFIXES):
+                os.remove(os.path.join(CACHE_DIR, name))
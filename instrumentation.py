@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+
+import pandas as pd
+
+from cache_paths import CACHE_ROOT
+
+# -----------------------------
+# Mesures de performance par étape
+# -----------------------------
+# Facultatif : activé par la case « Mesurer les performances » des tableaux
+# de bord (cochée par défaut si DONNEES_PROFILING=1). Chaque étape du
+# pipeline enregistre sa durée, le nombre de lignes en entrée/sortie et la
+# variation de mémoire du processus :
+#
+#     with stage("Filtre modèle", rows_in=len(df)) as s:
+#         ...
+#         s.rows_out = len(result)
+#
+# Sans profileur actif, `stage` ne fait rien (coût négligeable). Les mesures
+# sont affichées dans la barre latérale et ajoutées à un journal JSON lines.
+
+PROFILING_DEFAULT = os.environ.get("DONNEES_PROFILING", "0") == "1"
+LOG_PATH = os.environ.get(
+    "DONNEES_PROFILING_LOG",
+    os.path.join(CACHE_ROOT, "profiling.jsonl"),
+)
+
+_active = ContextVar("profiler", default=None)
+_log_lock = threading.Lock()
+
+
+def _rss_mb():
+    # Mémoire résidente du processus (Linux), sinon pic mémoire
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class _Stage:
+    def __init__(self, profiler, name, rows_in):
+        self.profiler = profiler
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+
+    def __enter__(self):
+        self.order = self.profiler.next_order
+        self.profiler.next_order += 1
+        self.depth = self.profiler.depth
+        self.profiler.depth += 1
+        self.memory_before = _rss_mb()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        self.profiler.depth -= 1
+        self.profiler.records.append({
+            'ordre': self.order,
+            'étape': self.name,
+            'niveau': self.depth,
+            'durée_ms': round(seconds * 1000, 3),
+            'lignes_entrée': self.rows_in,
+            'lignes_sortie': self.rows_out,
+            'mémoire_delta_mo': round(_rss_mb() - self.memory_before, 3),
+            'erreur': exc_type.__name__ if exc_type else None,
+        })
+        return False
+
+
+class _NullStage:
+    rows_out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Profiler:
+    def __init__(self, context=None, log_path=LOG_PATH):
+        self.context = context or {}
+        self.log_path = log_path
+        self.records = []
+        self.depth = 0
+        self.next_order = 0
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+
+    def stage(self, name, rows_in=None):
+        return _Stage(self, name, rows_in)
+
+    def to_frame(self):
+        frame = pd.DataFrame(self.records)
+        if frame.empty:
+            return frame
+        # Les étapes sont enregistrées à leur fin : on les remet dans l'ordre
+        # d'exécution en gardant l'imbrication lisible
+        frame = frame.sort_values('ordre')
+        frame['étape'] = ['  ' * level + name for level, name in zip(frame['niveau'], frame['étape'])]
+        return frame.drop(columns=['ordre', 'niveau'])
+
+    def flush(self):
+        if not self.records or not self.log_path:
+            return
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        with _log_lock, open(self.log_path, 'a', encoding='utf-8') as f:
+            for record in self.records:
+                f.write(json.dumps({'exécution': self.started_at, **self.context, **record}, ensure_ascii=False) + '\n')
+
+
+def stage(name, rows_in=None):
+    profiler = _active.get()
+    if profiler is None:
+        return _NULL_STAGE
+    return profiler.stage(name, rows_in)
+
+
+def start_profiling(profiler):
+    # `profiler` peut valoir None (mesures désactivées pour cette exécution)
+    _active.set(profiler)
+    return profiler
+
+
+def stop_profiling():
+    profiler = _active.get()
+    _active.set(None)
+    if profiler is not None:
+        profiler.flush()
+    return profiler
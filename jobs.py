@@ -0,0 +1,291 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from cache_paths import CACHE_ROOT
+
+# -----------------------------
+# Exécution des clusterings en arrière-plan
+# -----------------------------
+# Un clustering lancé depuis clus.py est soumis à un processus de travail :
+# la session Streamlit reste utilisable et les réexécutions (changement d'un
+# widget) n'interrompent pas le calcul. Le processus écrit l'étape en cours
+# dans un petit fichier JSON que l'interface relit ; l'annulation dépose un
+# fichier drapeau vérifié entre deux étapes.
+#
+# Chaque exécution est identifiée par le contenu des textes et les
+# paramètres : un résultat terminé est conservé sur disque et réaffiché
+# immédiatement quand on revient aux mêmes paramètres.
+
+JOB_DIR = os.path.join(CACHE_ROOT, "jobs")
+JOB_WORKERS = int(os.environ.get("DONNEES_JOB_WORKERS", 1))
+MAX_RESULTS = 20
+# Résultats gardés en mémoire (réaffichage à chaque rerun de l'interface)
+MAX_CACHED_RESULTS = 4
+# Fichiers d'avancement d'exécutions inconnues de ce processus (autre
+# serveur, redémarrage) supprimés au-delà de cet âge
+STALE_SECONDS = 24 * 3600
+
+STAGES = [
+    "Prétraitement",
+    "Quasi-doublons",
+    "Vectorisation et clustering",
+    "Index de recherche",
+]
+
+_pool = None
+_jobs = {}
+_results = OrderedDict()
+_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def job_key(lines, params, collapse):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps({'params': params, 'collapse': collapse}, sort_keys=True, default=str).encode('utf-8'))
+    for line in lines:
+        digest.update(line.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def _path(key, suffix):
+    return os.path.join(JOB_DIR, f"{key}{suffix}")
+
+
+def _write_progress(key, stage_index):
+    tmp_path = _path(key, ".tmp-progress.json")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'étape': STAGES[stage_index], 'avancement': stage_index / len(STAGES), 'mis_à_jour': time.time()}, f)
+    os.replace(tmp_path, _path(key, ".progress.json"))
+
+
+def _enter_stage(key, stage_index):
+    if os.path.exists(_path(key, ".cancel")):
+        raise JobCancelled()
+    _write_progress(key, stage_index)
+
+
+# -----------------------------
+# Travail exécuté dans le processus
+# -----------------------------
+def run_clustering_job(key, lines, params, collapse, force_refit=False, batch_size=None, n_process=1):
+    from preprocessing import BATCH_SIZE, preprocess_texts
+    from dedup import collapse_near_duplicates
+    from clustering import cluster_corpus
+    from ann_index import index_for
+
+    _enter_stage(key, 0)
+    texts = preprocess_texts(lines, batch_size=batch_size or BATCH_SIZE, n_process=n_process)
+
+    _enter_stage(key, 1)
+    # HDBSCAN ignore les poids : la densité des groupes serait perdue
+    if collapse and params['clust_method'] != "HDBSCAN":
+        representatives, groups, weights = collapse_near_duplicates(texts)
+    else:
+        representatives, groups, weights = np.arange(len(texts)), np.arange(len(texts)), None
+    unique_texts = [texts[i] for i in representatives]
+
+    _enter_stage(key, 2)
+    model, labels, coords, report = cluster_corpus(unique_texts, params, force_refit=force_refit, weights=weights)
+
+    _enter_stage(key, 3)
+    # Index de recherche des incidents similaires (un texte par groupe)
+    index_for(model, unique_texts, pd.DataFrame({
+        "Texte": [lines[i] for i in representatives],
+        "Cluster": labels,
+        "Occurrences": weights if weights is not None else 1,
+    }), key)
+    # Copie du pipeline : celui des paramètres peut être réappris ou complété
+    # ensuite par une exécution sur d'autres textes
+    tmp_path = _path(key, ".tmp-model.joblib")
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, _path(key, ".model.joblib"))
+
+    result = {
+        'texts': texts,
+        # Étiquettes et coordonnées recopiées sur toutes les lignes du groupe
+        'labels': labels[groups],
+        'coords': coords[groups],
+        'n_groups': len(representatives) if weights is not None else None,
+        'report': report,
+        'scores': model.scores,
+        'n_clusters': getattr(model.clusterer, 'n_clusters', None),
+        'finished_at': time.time(),
+    }
+    tmp_path = _path(key, ".tmp-result.joblib")
+    joblib.dump(result, tmp_path)
+    os.replace(tmp_path, _path(key, ".joblib"))
+    return key
+
+
+# -----------------------------
+# Côté interface
+# -----------------------------
+def _get_pool(renew=False):
+    global _pool
+    if renew and _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+    if _pool is None:
+        # « spawn » : le serveur Streamlit est multi-thread, un fork pourrait
+        # hériter de verrous tenus par d'autres threads
+        _pool = ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def submit(lines, params, collapse, force_refit=False, batch_size=None, n_process=1):
+    key = job_key(lines, params, collapse)
+    os.makedirs(JOB_DIR, exist_ok=True)
+    with _lock:
+        future = _jobs.get(key)
+        if future is not None and not future.done():
+            return key
+        if not force_refit and os.path.exists(_path(key, ".joblib")):
+            return key
+        for suffix in (".cancel", ".progress.json"):
+            if os.path.exists(_path(key, suffix)):
+                os.remove(_path(key, suffix))
+        args = (run_clustering_job, key, list(lines), params, collapse, force_refit, batch_size, n_process)
+        try:
+            _jobs[key] = _get_pool().submit(*args)
+        except BrokenProcessPool:
+            # Un processus de travail a été tué (mémoire...) : nouveau pool
+            _jobs[key] = _get_pool(renew=True).submit(*args)
+    _evict_results()
+    return key
+
+
+def cancel(key):
+    with _lock:
+        future = _jobs.get(key)
+    if future is None or future.done():
+        return
+    if not future.cancel():
+        # Déjà en cours : arrêt à la prochaine étape
+        open(_path(key, ".cancel"), 'w').close()
+
+
+def status(key):
+    # Retourne un dict {'état', 'étape', 'avancement', 'erreur'} ou None si
+    # aucune exécution n'est connue pour cette clé
+    with _lock:
+        future = _jobs.get(key)
+
+    if future is not None and not future.done():
+        if not future.running():
+            return {'état': 'en attente', 'étape': None, 'avancement': 0.0}
+        progress = {'étape': None, 'avancement': 0.0}
+        try:
+            with open(_path(key, ".progress.json"), encoding='utf-8') as f:
+                progress = json.load(f)
+        except (OSError, ValueError):
+            pass
+        state = 'annulation' if os.path.exists(_path(key, ".cancel")) else 'en cours'
+        return {'état': state, **progress}
+
+    if future is not None and (future.cancelled() or isinstance(future.exception(), JobCancelled)):
+        return {'état': 'annulé'}
+    if future is not None and future.exception() is not None:
+        return {'état': 'erreur', 'erreur': f"{type(future.exception()).__name__} : {future.exception()}"}
+    if os.path.exists(_path(key, ".joblib")):
+        return {'état': 'terminé', 'avancement': 1.0}
+    return None
+
+
+def result(key):
+    # Résultat terminé, relu sur disque seulement s'il a changé (nouvelle
+    # exécution sous la même clé)
+    path = _path(key, ".joblib")
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _lock:
+        entry = _results.get(key)
+        if entry is not None and entry[0] == stamp:
+            _results.move_to_end(key)
+            return entry[1]
+    value = joblib.load(path)
+    with _lock:
+        _results[key] = (stamp, value)
+        _results.move_to_end(key)
+        while len(_results) > MAX_CACHED_RESULTS:
+            _results.popitem(last=False)
+    return value
+
+
+def model(key):
+    # Pipeline ajusté par l'exécution `key` (recherche d'incidents similaires),
+    # None si elle n'est pas terminée
+    from clustering import cached_model
+    return cached_model(_path(key, ".model.joblib"))
+
+
+def list_jobs():
+    # Exécutions connues de ce processus serveur
+    with _lock:
+        keys = list(_jobs)
+    return pd.DataFrame([{'exécution': key[:8], **(status(key) or {})} for key in keys])
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _evict_results():
+    names = os.listdir(JOB_DIR)
+    files = [
+        os.path.join(JOB_DIR, name) for name in names
+        if name.endswith(".joblib") and not name.endswith(".model.joblib") and ".tmp-" not in name
+    ]
+    files.sort(key=os.path.getmtime)
+    evicted = set()
+    for path in files[:-MAX_RESULTS]:
+        key = os.path.basename(path)[:-len(".joblib")]
+        _remove(path)
+        _remove(_path(key, ".model.joblib"))
+        evicted.add(key)
+    if evicted:
+        from ann_index import remove_index
+        for key in evicted:
+            remove_index(key)
+
+    # Fichiers d'avancement et d'annulation : inutiles une fois l'exécution
+    # terminée ou son résultat supprimé
+    with _lock:
+        futures = dict(_jobs)
+        for key in evicted:
+            _results.pop(key, None)
+    now = time.time()
+    for name in names:
+        for suffix in (".progress.json", ".cancel"):
+            if not name.endswith(suffix) or ".tmp-" in name:
+                continue
+            key = name[:-len(suffix)]
+            path = os.path.join(JOB_DIR, name)
+            future = futures.get(key)
+            if key in evicted or (future is not None and future.done()):
+                _remove(path)
+            elif future is None:
+                try:
+                    if now - os.path.getmtime(path) > STALE_SECONDS:
+                        _remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,55 @@
+import os
+import threading
+
+# -----------------------------
+# Modèles NLP chargés à la demande
+# -----------------------------
+# spaCy et Sentence-BERT ne sont importés et chargés qu'à la première
+# utilisation, puis gardés pour toute la durée du processus : les
+# réexécutions Streamlit ne les rechargent pas, et une session qui n'utilise
+# que TF-IDF ne charge jamais Sentence-BERT.
+#
+# Les mots vides français sont ceux de NLTK, copiés dans stopwords_fr.txt :
+# aucun téléchargement (ni accès réseau) au démarrage.
+
+SPACY_MODEL = "fr_core_news_sm"
+# La lemmatisation n'a besoin que de tok2vec, morphologizer,
+# attribute_ruler et lemmatizer
+SPACY_EXCLUDE = ["parser", "ner", "senter"]
+SBERT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+STOPWORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stopwords_fr.txt")
+
+_resources = {}
+_lock = threading.Lock()
+
+
+def _get(key, load):
+    resource = _resources.get(key)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(key)
+            if resource is None:
+                resource = load()
+                _resources[key] = resource
+    return resource
+
+
+def get_nlp():
+    def load():
+        import spacy
+        return spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+    return _get(('spacy', SPACY_MODEL), load)
+
+
+def get_sbert(model_name=SBERT_MODEL):
+    def load():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    return _get(('sbert', model_name), load)
+
+
+def get_stop_words():
+    def load():
+        with open(STOPWORDS_PATH, encoding='utf-8') as f:
+            return frozenset(line.strip() for line in f if line.strip())
+    return _get(('stopwords', 'fr'), load)
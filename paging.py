@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+
+# -----------------------------
+# Pagination côté serveur
+# -----------------------------
+# Seule la page visible est envoyée au navigateur. Pour les premières pages,
+# on ne trie que les k premières lignes (np.partition puis tri des k
+# retenues) ; l'ordre calculé est mis en cache par état des filtres, colonne
+# et sens de tri, la navigation entre pages ne retrie donc pas.
+#
+# L'ordre est total : à valeur égale, les lignes gardent leur ordre
+# d'origine, ce qui rend les pages cohérentes entre elles.
+
+MAX_CACHED_ORDERS = 8
+# Au-delà de cette fraction des lignes, un tri complet est plus simple
+FULL_SORT_FRACTION = 0.25
+
+_orders = OrderedDict()
+_lock = threading.Lock()
+
+
+def sort_keys(series, ascending=True):
+    # Clé numérique float64 ; valeurs manquantes toujours en fin de tableau
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Catégories triées lors de la normalisation : l'ordre des codes suit
+        # celui des libellés
+        if not series.cat.ordered and not series.cat.categories.is_monotonic_increasing:
+            series = series.cat.reorder_categories(sorted(series.cat.categories))
+        codes = series.cat.codes.to_numpy()
+        keys = np.where(codes < 0, np.nan, codes).astype('float64')
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        values = series.to_numpy()
+        keys = values.view('int64').astype('float64')
+        keys[np.isnat(values)] = np.nan
+    elif pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        # Copie : le tableau peut être en lecture seule, ou partager la
+        # mémoire du DataFrame mis en cache
+        keys = np.array(series.to_numpy(dtype='float64', na_value=np.nan), dtype='float64', copy=True)
+    else:
+        # Texte : rang dans l'ordre lexicographique
+        codes, _ = pd.factorize(series.astype('string'), sort=True)
+        keys = np.where(codes < 0, np.nan, codes).astype('float64')
+
+    if not ascending:
+        keys = -keys
+    keys[np.isnan(keys)] = np.inf
+    return keys
+
+
+def top_k(keys, k):
+    # Positions des k plus petites clés, dans l'ordre (clé, position)
+    n = len(keys)
+    if k >= n * FULL_SORT_FRACTION:
+        return np.lexsort((np.arange(n), keys))
+    threshold = np.partition(keys, k - 1)[k - 1]
+    below = np.flatnonzero(keys < threshold)
+    ties = np.flatnonzero(keys == threshold)[:k - len(below)]
+    selected = np.concatenate([below, ties])
+    return selected[np.lexsort((selected, keys[selected]))]
+
+
+def page(df, state_key, sort_col, ascending=False, page_number=0, page_size=500):
+    # Retourne les lignes de la page demandée (numérotée à partir de 0)
+    n = len(df)
+    start = page_number * page_size
+    stop = min(start + page_size, n)
+    if start >= n:
+        return df.iloc[0:0]
+
+    cache_key = (state_key, sort_col, ascending)
+    with _lock:
+        order = _orders.get(cache_key)
+        if order is not None:
+            _orders.move_to_end(cache_key)
+
+    if order is None or (len(order) < stop and len(order) < n):
+        # On prévoit quelques pages d'avance pour la navigation
+        k = min(n, max(stop * 2, page_size * 4))
+        with stage(f"Tri par {sort_col}", rows_in=n) as s:
+            keys = sort_keys(df[sort_col], ascending)
+            order = top_k(keys, k)
+            s.rows_out = len(order)
+        with _lock:
+            _orders[cache_key] = order
+            _orders.move_to_end(cache_key)
+            while len(_orders) > MAX_CACHED_ORDERS:
+                _orders.popitem(last=False)
+
+    return df.iloc[order[start:stop]]
+
+
+def page_count(n_rows, page_size):
+    return max(1, -(-n_rows // page_size))
@@ -0,0 +1,172 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from ingestion import load_excel
+import fleet_store
+from schema import normalize_fleet
+from serials import decode_manufacturing_dates
+from filters import engine_for
+from instrumentation import stage
+from cube import MONTH_DIM, cube_for, cube_table, group_report, summarize
+
+# -----------------------------
+# Pipeline des tableaux de bord
+# -----------------------------
+# Ingestion, filtrage et agrégation communs à app.py et VF.py, utilisables
+# sans navigateur. En ligne de commande, le mode `batch` traite un dossier
+# d'extractions Excel mensuelles (un processus par fichier) :
+#
+#     python pipeline.py batch extractions/ resultats/ --workers 8
+#
+# Le mode `merge` fusionne des extractions dans le parc enregistré (voir
+# fleet_store.py), dans l'ordre donné :
+#
+#     python pipeline.py merge extractions/2024-01.xlsx extractions/2024-02.xlsx
+
+# Espace de noms des fichiers traités dans le cache d'ingestion
+NAMESPACE = "fleet"
+REPORT_DIMS = ['modèle', 'filiale', MONTH_DIM]
+
+
+# Fonction pour traiter les données
+def process_data(df):
+    # Conversion des types (dates, catégories, compteurs compacts)
+    with stage("Conversion des types et des dates", rows_in=len(df)):
+        df = normalize_fleet(df)
+
+    # Extraction année/mois de fabrication depuis numéro de série si nécessaire
+    if 'Date de fabrication' not in df.columns and 'no de série' in df.columns:
+        with stage("Décodage des numéros de série", rows_in=len(df)):
+            dates, _, n_malformed = decode_manufacturing_dates(df['no de série'], df.get('modèle'))
+            df['Date de fabrication'] = dates
+            df.attrs['serials_malformed'] = n_malformed
+
+    # Calcul du délai avant premier incident
+    if all(col in df.columns for col in ['Première date incident', 'date d\'installation']):
+        with stage("Délai avant premier incident", rows_in=len(df)):
+            df['délai_premier_incident'] = (df['Première date incident'] - df['date d\'installation']).dt.days
+
+    return df
+
+
+def load_fleet(source):
+    # `source` : fichier téléversé, chemin ou contenu binaire d'un xlsx
+    return load_excel(source, process_data, namespace=NAMESPACE)
+
+
+def load_store():
+    # Parc enregistré, None si aucune extraction n'a encore été fusionnée
+    return fleet_store.load_store()
+
+
+def merge_extract(source):
+    # Retourne (parc fusionné, rapport de fusion)
+    return fleet_store.merge_extract(source, process_data)
+
+
+def apply_filters(df, selected=None, contains=None, ranges=None):
+    # Retourne (lignes filtrées, table d'agrégats, identifiant de l'état des filtres)
+    selected = selected or {}
+    contains = contains or {}
+    ranges = ranges or {}
+    engine = engine_for(df)
+    with stage("Filtres", rows_in=len(df)) as s:
+        filtered = engine.apply(df, selected=selected, contains=contains, ranges=ranges)
+        s.rows_out = len(filtered)
+    with stage("Agrégats", rows_in=len(filtered)):
+        summary = summarize(cube_for(df), engine, filtered, selected, contains, ranges)
+    return filtered, summary, engine.state_key(selected, contains, ranges)
+
+
+# -----------------------------
+# Mode batch
+# -----------------------------
+def process_file(path, output_dir):
+    start = time.perf_counter()
+    name = os.path.splitext(os.path.basename(path))[0]
+
+    # Passe par le cache d'ingestion : les tableaux de bord ouvriront ce
+    # fichier directement depuis les copies Parquet et l'index de recherche
+    df = load_fleet(path)
+    engine_for(df)
+
+    df.to_parquet(os.path.join(output_dir, f"{name}.parquet"), index=False)
+    table = cube_table(df)
+    table.to_parquet(os.path.join(output_dir, f"{name}.cube.parquet"), index=False)
+    for by in REPORT_DIMS:
+        if by in table.columns:
+            group_report(table, by).to_csv(os.path.join(output_dir, f"{name}.par_{by}.csv"), index=False)
+
+    return {
+        'fichier': os.path.basename(path),
+        'lignes': len(df),
+        'séries_illisibles': df.attrs.get('serials_malformed', 0),
+        'durée_s': round(time.perf_counter() - start, 3),
+    }
+
+
+def run_batch(input_dir, output_dir, workers=None):
+    paths = sorted(
+        os.path.join(input_dir, name)
+        for name in os.listdir(input_dir)
+        if name.lower().endswith('.xlsx') and not name.startswith('~$')
+    )
+    os.makedirs(output_dir, exist_ok=True)
+
+    results = []
+    errors = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_file, path, output_dir): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                errors.append((path, e))
+                print(f"ERREUR {os.path.basename(path)} : {e}", file=sys.stderr)
+                continue
+            results.append(result)
+            print(f"{result['fichier']} : {result['lignes']} lignes en {result['durée_s']} s")
+
+    if results:
+        summary = pd.DataFrame(results).sort_values('fichier')
+        summary.to_csv(os.path.join(output_dir, "resume_batch.csv"), index=False)
+    return results, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline des tableaux de bord produits")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    batch = commands.add_parser('batch', help="Traite un dossier d'extractions Excel")
+    batch.add_argument('input_dir', help="Dossier contenant les fichiers .xlsx")
+    batch.add_argument('output_dir', help="Dossier des fichiers Parquet et des rapports")
+    batch.add_argument('--workers', type=int, default=None, help="Nombre de processus (défaut : nombre de cœurs)")
+
+    merge = commands.add_parser('merge', help="Fusionne des extractions Excel dans le parc enregistré")
+    merge.add_argument('paths', nargs='+', help="Fichiers .xlsx, du plus ancien au plus récent")
+
+    args = parser.parse_args(argv)
+    if args.command == 'batch':
+        _, errors = run_batch(args.input_dir, args.output_dir, args.workers)
+        return 1 if errors else 0
+    if args.command == 'merge':
+        for path in args.paths:
+            df, report = merge_extract(path)
+            if report['déjà_fusionné']:
+                print(f"{os.path.basename(path)} : déjà fusionné")
+                continue
+            print(
+                f"{os.path.basename(path)} : {report['nouveaux']} nouveaux, {report['modifiés']} modifiés, "
+                f"{report['inchangés']} inchangés ({len(df)} produits dans le parc)"
+            )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from nlp_resources import SPACY_MODEL, get_nlp, get_stop_words
+
+# -----------------------------
+# Nettoyage et lemmatisation des textes
+# -----------------------------
+# Les textes passent par lots dans `nlp.pipe` (éventuellement sur plusieurs
+# processus). Le résultat de chaque ligne est mémorisé, indexé par une
+# empreinte de son contenu : une réexécution avec quelques lignes ajoutées
+# ne lemmatise que les nouvelles.
+
+BATCH_SIZE = 256
+N_PROCESS = 1
+# Nombre de lignes lemmatisées gardées en mémoire (les plus anciennes sortent)
+MAX_MEMO_ENTRIES = 1_000_000
+
+_CLEAN_RE = re.compile(r"[^a-zA-Zàâçéèêëîïôûùüÿñæœ\s]")
+
+_memo = OrderedDict()
+_lock = threading.Lock()
+
+
+def clean_text(text):
+    return _CLEAN_RE.sub(" ", text.lower())
+
+
+def lemmatize(doc, stop_words):
+    return " ".join(token.lemma_ for token in doc if token.text not in stop_words and not token.is_punct)
+
+
+def text_key(text):
+    return hashlib.blake2b(f"{SPACY_MODEL}\0{text}".encode('utf-8'), digest_size=16).digest()
+
+
+def preprocess_text(text):
+    return preprocess_texts([text])[0]
+
+
+def preprocess_texts(texts, batch_size=BATCH_SIZE, n_process=N_PROCESS):
+    keys = [text_key(text) for text in texts]
+
+    results = {}
+    with _lock:
+        for key in keys:
+            if key not in results and key in _memo:
+                results[key] = _memo[key]
+                _memo.move_to_end(key)
+
+    # Lignes jamais vues (une seule fois chacune, même si répétées)
+    todo = {}
+    for key, text in zip(keys, texts):
+        if key not in results and key not in todo:
+            todo[key] = text
+
+    if todo:
+        stop_words = get_stop_words()
+        docs = get_nlp().pipe(
+            (clean_text(text) for text in todo.values()),
+            batch_size=batch_size,
+            n_process=n_process,
+        )
+        computed = {key: lemmatize(doc, stop_words) for key, doc in zip(todo, docs)}
+        results.update(computed)
+        with _lock:
+            _memo.update(computed)
+            while len(_memo) > MAX_MEMO_ENTRIES:
+                _memo.popitem(last=False)
+
+    return [results[key] for key in keys]
+
+
+def clear_memo():
+    with _lock:
+        _memo.clear()
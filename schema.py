@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Schéma du parc de produits
+# -----------------------------
+# Chaque colonne connue est convertie vers un type compact : catégories pour
+# les colonnes à faible cardinalité, entiers les plus petits possibles pour
+# les compteurs, chaînes Arrow pour les numéros de série et dates parsées
+# avec des formats explicites.
+
+CATEGORY_COLS = ['modèle', 'filiale']
+COUNTER_COLS = ['nombre_incidents', 'nombre_retours']
+STRING_COLS = ['no de série']
+DATE_COLS = ['date d\'installation', 'dernière connexion', 'Première date incident', 'Date de fabrication']
+
+# Formats essayés, dans l'ordre, pour les dates saisies sous forme de texte
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M', '%d-%m-%Y']
+
+try:
+    import pyarrow  # noqa: F401
+    SERIAL_DTYPE = 'string[pyarrow]'
+except ImportError:
+    SERIAL_DTYPE = 'string'
+
+
+def memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def parse_dates(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    if pd.api.types.is_numeric_dtype(series):
+        # Numéros de série de dates Excel (jours depuis le 30/12/1899)
+        return pd.to_datetime(series, unit='D', origin='1899-12-30', errors='coerce')
+
+    values = series.astype('string').str.strip()
+    best = None
+    for fmt in DATE_FORMATS:
+        parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+        if best is None or parsed.notna().sum() > best.notna().sum():
+            best = parsed
+        if best.notna().sum() == values.notna().sum():
+            return best
+    # Dernier recours pour les formats non prévus (lent, analyse valeur par valeur)
+    fallback = pd.to_datetime(values, errors='coerce', format='mixed', dayfirst=True)
+    return best.fillna(fallback)
+
+
+def downcast_counter(series):
+    numeric = pd.to_numeric(series, errors='coerce')
+    if numeric.isna().any():
+        # Entier nullable pour conserver les valeurs manquantes
+        numeric = numeric.round().astype('Int64')
+        low, high = numeric.min(), numeric.max()
+        for dtype in ['Int8', 'Int16', 'Int32']:
+            info = np.iinfo(dtype.lower())
+            if pd.isna(low) or (info.min <= low and high <= info.max):
+                return numeric.astype(dtype)
+        return numeric
+    if numeric.min() >= 0:
+        return pd.to_numeric(numeric, downcast='unsigned')
+    return pd.to_numeric(numeric, downcast='integer')
+
+
+def normalize_fleet(df):
+    before = memory_mb(df)
+
+    for col in DATE_COLS:
+        if col in df.columns:
+            df[col] = parse_dates(df[col])
+
+    for col in COUNTER_COLS:
+        if col in df.columns:
+            df[col] = downcast_counter(df[col])
+
+    for col in CATEGORY_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype('string').astype('category')
+
+    for col in STRING_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype('string').str.strip().astype(SERIAL_DTYPE)
+
+    df.attrs['memory_report'] = {'before_mb': before, 'after_mb': memory_mb(df)}
+    return df
@@ -0,0 +1,218 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Index n-grammes pour la recherche textuelle
+# -----------------------------
+# Chaque valeur (en minuscules) est découpée en trigrammes ; un trigramme est
+# codé sur un entier 64 bits (3 points de code Unicode de 21 bits). L'index
+# associe à chaque trigramme la liste triée des lignes qui le contiennent.
+# Une recherche de sous-chaîne intersecte les listes des trigrammes de la
+# requête puis vérifie les quelques candidates restantes.
+#
+# Syntaxe des requêtes :
+# - `abc`        sous-chaîne
+# - `abc*`       préfixe
+# - `abc 12`     plusieurs termes (tous requis)
+# - `abc, def`   alternatives (l'une ou l'autre)
+
+N = 3
+CHUNK_ROWS = 200_000
+_MAX_CHAR = '\U0010ffff'
+
+
+def _codepoints(values):
+    # Matrice (lignes x caractères) des points de code, complétée par des zéros
+    width = max(1, int(values.str.len().max() or 0))
+    array = values.to_numpy(dtype=f'U{width}')
+    return array.view(np.uint32).reshape(len(array), width).astype(np.int64)
+
+
+def _gram_keys(codes):
+    # codes : matrice (lignes x caractères) -> matrice (lignes x positions)
+    return (codes[:, :-2] << 42) | (codes[:, 1:-1] << 21) | codes[:, 2:]
+
+
+def _query_keys(term):
+    codes = np.array([ord(c) for c in term], dtype=np.int64)[None, :]
+    return np.unique(_gram_keys(codes))
+
+
+class NgramIndex:
+    def __init__(self, values, _arrays=None, _lower=None):
+        # `_lower` : valeurs déjà passées en minuscules (voir extend)
+        self.lower = values.astype('string').str.lower().fillna('') if _lower is None else _lower
+        self.n_rows = len(self.lower)
+        if _arrays is None:
+            _arrays = self._build()
+        self.grams = _arrays['grams']
+        self.offsets = _arrays['offsets']
+        self.postings = _arrays['postings']
+        self.short_rows = _arrays['short_rows']
+        self.sorted_rows = _arrays['sorted_rows']
+        self.sorted_lower = self.lower.to_numpy(dtype=object)[self.sorted_rows]
+
+    def _build(self):
+        lengths = self.lower.str.len().to_numpy()
+        keys = []
+        rows = []
+        for start in range(0, self.n_rows, CHUNK_ROWS):
+            chunk = self.lower.iloc[start:start + CHUNK_ROWS]
+            if chunk.str.len().max() < N:
+                continue
+            grams = _gram_keys(_codepoints(chunk))
+            # Un trigramme est valide si son dernier caractère n'est pas du remplissage
+            chunk_lengths = lengths[start:start + CHUNK_ROWS]
+            valid = np.arange(grams.shape[1])[None, :] + N <= chunk_lengths[:, None]
+            row_ids = np.broadcast_to(np.arange(start, start + len(chunk))[:, None], grams.shape)
+            keys.append(grams[valid])
+            rows.append(row_ids[valid])
+
+        keys = np.concatenate(keys) if keys else np.empty(0, dtype=np.int64)
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        # Les lignes sont déjà croissantes : un tri stable sur le trigramme suffit
+        order = np.argsort(keys, kind='stable')
+        keys, rows = keys[order], rows[order]
+        if len(keys):
+            distinct = np.r_[True, (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])]
+            keys, rows = keys[distinct], rows[distinct]
+
+        grams, starts = np.unique(keys, return_index=True)
+        return {
+            'grams': grams,
+            'offsets': np.r_[starts, len(keys)].astype(np.int64),
+            'postings': rows.astype(np.int32 if self.n_rows < 2 ** 31 else np.int64),
+            'short_rows': np.flatnonzero(lengths < N),
+            'sorted_rows': self.lower.argsort(kind='stable').to_numpy(),
+        }
+
+    def extend(self, values):
+        # Index de `values`, dont les premières lignes sont celles de cet
+        # index (mêmes valeurs) : seules les lignes ajoutées sont découpées,
+        # leurs listes sont fusionnées avec les listes existantes
+        old_rows = self.n_rows
+        added = NgramIndex(values.iloc[old_rows:].reset_index(drop=True))
+        keys = np.concatenate([
+            np.repeat(self.grams, np.diff(self.offsets)),
+            np.repeat(added.grams, np.diff(added.offsets)),
+        ])
+        rows = np.concatenate([self.postings.astype(np.int64), added.postings.astype(np.int64) + old_rows])
+        # Tri stable : les lignes restent croissantes dans chaque liste
+        order = np.argsort(keys, kind='stable')
+        keys, rows = keys[order], rows[order]
+        grams, starts = np.unique(keys, return_index=True)
+        # Minuscules déjà calculées pour les lignes existantes et ajoutées
+        lower = pd.concat([self.lower, added.lower], ignore_index=True)
+        return NgramIndex(values, _lower=lower, _arrays={
+            'grams': grams,
+            'offsets': np.r_[starts, len(keys)].astype(np.int64),
+            'postings': rows.astype(np.int32 if len(values) < 2 ** 31 else np.int64),
+            'short_rows': np.r_[self.short_rows, added.short_rows + old_rows],
+            'sorted_rows': lower.argsort(kind='stable').to_numpy(),
+        })
+
+    # -----------------------------
+    # Recherche
+    # -----------------------------
+    def _posting(self, key):
+        i = np.searchsorted(self.grams, key)
+        if i == len(self.grams) or self.grams[i] != key:
+            return np.empty(0, dtype=self.postings.dtype)
+        return self.postings[self.offsets[i]:self.offsets[i + 1]]
+
+    def _verify(self, rows, term):
+        if len(rows) == 0:
+            return rows
+        found = self.lower.iloc[rows].str.contains(term, regex=False).to_numpy(dtype=bool)
+        return rows[found]
+
+    def substring(self, term):
+        term = term.lower()
+        if len(term) >= N:
+            postings = sorted((self._posting(k) for k in _query_keys(term)), key=len)
+            rows = postings[0]
+            for other in postings[1:]:
+                if len(rows) == 0:
+                    break
+                rows = np.intersect1d(rows, other, assume_unique=True)
+            if len(term) == N:
+                return rows
+            return self._verify(rows, term)
+
+        # Requête courte : trigrammes du vocabulaire qui contiennent le terme
+        chars = np.stack([(self.grams >> 42) & 0x1FFFFF, (self.grams >> 21) & 0x1FFFFF, self.grams & 0x1FFFFF], axis=1)
+        codes = [ord(c) for c in term]
+        matches = np.zeros(len(self.grams), dtype=bool)
+        for offset in range(N - len(term) + 1):
+            hit = np.ones(len(self.grams), dtype=bool)
+            for j, code in enumerate(codes):
+                hit &= chars[:, offset + j] == code
+            matches |= hit
+        mask = np.zeros(self.n_rows, dtype=bool)
+        for i in np.flatnonzero(matches):
+            mask[self.postings[self.offsets[i]:self.offsets[i + 1]]] = True
+        mask[self._verify(self.short_rows, term)] = True
+        return np.flatnonzero(mask)
+
+    def prefix(self, term):
+        term = term.lower()
+        start = np.searchsorted(self.sorted_lower, term, side='left')
+        stop = np.searchsorted(self.sorted_lower, term + _MAX_CHAR, side='left')
+        return np.sort(self.sorted_rows[start:stop])
+
+    def search(self, query):
+        # Retourne les numéros de ligne (triés) correspondant à la requête
+        result = None
+        for alternative in query.split(','):
+            terms = alternative.split()
+            if not terms:
+                continue
+            rows = None
+            for term in terms:
+                found = self.prefix(term[:-1]) if term.endswith('*') else self.substring(term)
+                rows = found if rows is None else np.intersect1d(rows, found, assume_unique=True)
+            result = rows if result is None else np.union1d(result, rows)
+        if result is None:
+            return np.arange(self.n_rows)
+        return result
+
+    # -----------------------------
+    # Persistance
+    # -----------------------------
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez(
+            tmp_path,
+            grams=self.grams,
+            offsets=self.offsets,
+            postings=self.postings,
+            short_rows=self.short_rows,
+            sorted_rows=self.sorted_rows,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, values):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        if len(arrays['sorted_rows']) != len(values):
+            raise ValueError(f"Index {path} incompatible avec les données ({len(values)} lignes)")
+        return cls(values, _arrays=arrays)
+
+
+def load_or_build(values, path=None):
+    if path and os.path.exists(path):
+        try:
+            return NgramIndex.load(path, values)
+        except (OSError, ValueError, KeyError):
+            pass
+    index = NgramIndex(values)
+    if path:
+        try:
+            index.save(path)
+        except OSError:
+            pass
+    return index
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Décodage des numéros de série
+# -----------------------------
+# La date de fabrication est encodée dans le préfixe du numéro de série
+# (par défaut MMAA : mois puis année sur deux chiffres). Les décodeurs
+# travaillent sur la colonne entière avec les opérations de chaînes de
+# pandas, sans boucle Python par ligne.
+#
+# D'autres formats peuvent être enregistrés puis associés à des modèles :
+#
+#     register_decoder('AAMM', slice_decoder(month=(2, 4), year=(0, 2)))
+#     register_model_format('VRS', 'AAMM')
+
+SERIAL_DECODERS = {}
+MODEL_FORMATS = {}
+DEFAULT_FORMAT = 'MMAA'
+
+
+def register_decoder(name, decoder):
+    # `decoder` reçoit une Series de chaînes et retourne une Series datetime64
+    # (NaT pour les numéros illisibles), de même index.
+    SERIAL_DECODERS[name] = decoder
+    return decoder
+
+
+def register_model_format(model, name):
+    if name not in SERIAL_DECODERS:
+        raise KeyError(f"Format de numéro de série inconnu : {name}")
+    MODEL_FORMATS[model] = name
+
+
+def _digits(parts):
+    return parts.where(parts.str.isdigit()).astype('Int64')
+
+
+def _as_float(values):
+    if isinstance(values, pd.Series):
+        return values.to_numpy(dtype='float64', na_value=np.nan)
+    return np.asarray(values, dtype='float64')
+
+
+def months_to_dates(years, months, index=None):
+    years = _as_float(years)
+    months = _as_float(months)
+    valid = ~np.isnan(years) & (months >= 1) & (months <= 12)
+
+    dates = np.full(len(years), np.datetime64('NaT'), dtype='datetime64[M]')
+    offsets = (years[valid] - 1970) * 12 + (months[valid] - 1)
+    dates[valid] = offsets.astype('int64').astype('datetime64[M]')
+    return pd.Series(dates.astype('datetime64[ns]'), index=index)
+
+
+def slice_decoder(month=(0, 2), year=(2, 4), century=2000):
+    def decode(serials):
+        serials = serials.astype('string').str.strip()
+        months = _digits(serials.str.slice(*month))
+        years = _digits(serials.str.slice(*year)) + century
+        return months_to_dates(years, months, index=serials.index)
+    return decode
+
+
+register_decoder('MMAA', slice_decoder(month=(0, 2), year=(2, 4)))
+register_decoder('AAMM', slice_decoder(month=(2, 4), year=(0, 2)))
+
+
+def decode_manufacturing_dates(serials, models=None):
+    # Retourne (dates, masque des numéros décodés, nombre de numéros illisibles)
+    dates = SERIAL_DECODERS[DEFAULT_FORMAT](serials)
+
+    if models is not None and MODEL_FORMATS:
+        for name in set(MODEL_FORMATS.values()):
+            if name == DEFAULT_FORMAT:
+                continue
+            targets = [m for m, fmt in MODEL_FORMATS.items() if fmt == name]
+            subset = models.isin(targets).to_numpy()
+            if subset.any():
+                dates[subset] = SERIAL_DECODERS[name](serials[subset])
+
+    valid = dates.notna().to_numpy()
+    n_malformed = int((serials.notna().to_numpy() & ~valid).sum())
+    return dates, valid, n_malformed
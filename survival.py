@@ -0,0 +1,176 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from cube import DATE_COL, MONTH_DIM
+from instrumentation import stage
+
+# -----------------------------
+# Fiabilité : délai avant premier incident
+# -----------------------------
+# Un produit sans incident est censuré à sa dernière connexion : on sait
+# seulement qu'il a fonctionné jusque-là. La moyenne du délai ne porte que
+# sur les produits ayant eu un incident ; l'estimateur de Kaplan-Meier tient
+# compte des produits censurés.
+#
+# Toutes les cohortes (modèle × mois de fabrication par défaut) sont
+# calculées en une passe : tri par (cohorte, délai), effectifs par délai
+# distinct avec np.add.reduceat, puis produit cumulé des (1 - d/n) sous forme
+# de sommes cumulées de logarithmes, remises à zéro au début de chaque
+# cohorte. Les résultats sont mis en cache par état des filtres.
+
+INSTALL_COL = "date d'installation"
+INCIDENT_COL = 'Première date incident'
+LAST_SEEN_COL = 'dernière connexion'
+COHORT_DIMS = ['modèle', MONTH_DIM]
+# Horizons (jours) de la fiabilité résumée par cohorte
+HORIZONS = [365, 730]
+# Intervalle de confiance à 95 % (variance de Greenwood)
+Z = 1.96
+DAYS_PER_YEAR = 365.25
+MAX_CACHED_RESULTS = 16
+
+_results = OrderedDict()
+_lock = threading.Lock()
+
+
+def durations(df):
+    # (délai en jours, incident observé) ; délai NaN si le produit n'a ni
+    # incident ni dernière connexion, ou si les dates sont incohérentes
+    install = df[INSTALL_COL]
+    incident = df[INCIDENT_COL] if INCIDENT_COL in df.columns else pd.Series(pd.NaT, index=df.index)
+    event = incident.notna().to_numpy()
+    end = incident.where(incident.notna(), df[LAST_SEEN_COL]) if LAST_SEEN_COL in df.columns else incident
+    # Le tableau retourné par pandas peut être en lecture seule
+    days = (end - install).dt.days.to_numpy(dtype='float64', na_value=np.nan)
+    return np.where(days < 0, np.nan, days), event
+
+
+def _cohort_keys(df, by):
+    keys = {}
+    for col in by:
+        if col == MONTH_DIM:
+            keys[col] = df[DATE_COL].dt.to_period('M').dt.start_time
+        else:
+            keys[col] = df[col]
+    return pd.DataFrame(keys, index=df.index)
+
+
+def _segment_cumsum(values, segment, segment_first):
+    # Somme cumulée remise à zéro au début de chaque segment
+    total = np.cumsum(values)
+    offset = total[segment_first] - values[segment_first]
+    return total - offset[segment]
+
+
+def kaplan_meier(df, by=COHORT_DIMS, horizons=HORIZONS):
+    # Retourne (courbes, cohortes) :
+    # - courbes : une ligne par (cohorte, délai distinct) avec effectif à
+    #   risque, incidents, censures, survie et intervalle de confiance ;
+    # - cohortes : une ligne par cohorte avec effectif, incidents, exposition,
+    #   taux d'incidents pour 100 produits-années et fiabilité aux horizons.
+    by = [col for col in by if col in df.columns or (col == MONTH_DIM and DATE_COL in df.columns)]
+    days, event = durations(df)
+    if by:
+        grouper = _cohort_keys(df, by).groupby(by, observed=True, sort=True)
+        group = grouper.ngroup().to_numpy(dtype='float64', na_value=np.nan)
+        labels = grouper.size().index.to_frame(index=False)
+    else:
+        group = np.zeros(len(df))
+        labels = pd.DataFrame(index=[0])
+    valid = ~np.isnan(days) & ~np.isnan(group)
+    g = group[valid].astype(np.int64)
+    t = days[valid].astype(np.int64)
+    e = event[valid]
+
+    order = np.lexsort((t, g))
+    g, t, e = g[order], t[order], e[order]
+
+    # Une ligne par (cohorte, délai distinct)
+    starts = np.flatnonzero(np.r_[True, (g[1:] != g[:-1]) | (t[1:] != t[:-1])]) if len(t) else np.zeros(0, np.int64)
+    removed = np.diff(np.r_[starts, len(t)])
+    incidents = np.add.reduceat(e.astype(np.int64), starts) if len(t) else np.zeros(0, np.int64)
+    cohort, time = g[starts], t[starts]
+
+    # Segments : lignes de chaque cohorte présente
+    segment_start = np.r_[True, cohort[1:] != cohort[:-1]] if len(cohort) else np.zeros(0, bool)
+    segment = np.cumsum(segment_start) - 1
+    segment_first = np.flatnonzero(segment_start)
+    size = np.add.reduceat(removed, segment_first) if len(removed) else np.zeros(0, np.int64)
+    at_risk = size[segment] - (_segment_cumsum(removed, segment, segment_first) - removed)
+
+    hazard = incidents / at_risk
+    # Tous les produits à risque ont un incident : la survie tombe à 0
+    exhausted = _segment_cumsum((hazard >= 1).astype(np.int64), segment, segment_first) > 0
+    safe = np.where(hazard >= 1, 0.0, hazard)
+    survival = np.where(exhausted, 0.0, np.exp(_segment_cumsum(np.log1p(-safe), segment, segment_first)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        greenwood = np.where(hazard >= 1, 0.0, incidents / (at_risk * (at_risk - incidents)))
+    error = survival * np.sqrt(_segment_cumsum(greenwood, segment, segment_first))
+
+    curves = labels.iloc[cohort].reset_index(drop=True)
+    curves['délai'] = time
+    curves['à_risque'] = at_risk
+    curves['incidents'] = incidents
+    curves['censurés'] = removed - incidents
+    curves['survie'] = survival
+    curves['survie_basse'] = np.clip(survival - Z * error, 0, 1)
+    curves['survie_haute'] = np.clip(survival + Z * error, 0, 1)
+
+    # Résumé par cohorte (sommes sur les lignes de la cohorte)
+    unit_segment = np.r_[True, g[1:] != g[:-1]] if len(g) else np.zeros(0, bool)
+    unit_first = np.flatnonzero(unit_segment)
+    cohorts = labels.iloc[cohort[segment_first]].reset_index(drop=True)
+    cohorts['produits'] = size
+    cohorts['incidents'] = np.add.reduceat(incidents, segment_first) if len(segment_first) else 0
+    exposure = np.add.reduceat(t, unit_first) / DAYS_PER_YEAR if len(unit_first) else np.zeros(0)
+    cohorts['exposition_années'] = exposure
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cohorts['taux_pour_100_an'] = np.where(exposure > 0, cohorts['incidents'] * 100 / exposure, np.nan)
+    last = np.r_[segment_first[1:], len(time)] - 1
+    follow_up = time[last] if len(time) else np.zeros(0, np.int64)
+    cohorts['suivi_max'] = follow_up
+
+    # Survie à chaque horizon : dernière ligne de la cohorte avant l'horizon
+    # (clé cohorte × délai croissante sur toutes les lignes)
+    width = int(time.max()) + 1 if len(time) else 1
+    keys = segment * width + time
+    for horizon in horizons:
+        position = np.searchsorted(keys, np.arange(len(segment_first)) * width + horizon, side='right') - 1
+        value = np.where(position >= segment_first, survival[np.maximum(position, 0)], 1.0)
+        # Suivi trop court pour estimer la survie à cet horizon
+        cohorts[f'fiabilité_{horizon}j'] = np.where(follow_up >= horizon, value, np.nan)
+    return curves, cohorts
+
+
+def reliability(df, state_key, by=COHORT_DIMS):
+    # kaplan_meier en cache par état des filtres (voir FilterEngine.state_key)
+    cache_key = (state_key, tuple(by))
+    with _lock:
+        result = _results.get(cache_key)
+        if result is not None:
+            _results.move_to_end(cache_key)
+            return result
+    with stage(f"Fiabilité par {' × '.join(by)}", rows_in=len(df)) as s:
+        result = kaplan_meier(df, by)
+        s.rows_out = len(result[1])
+    with _lock:
+        _results[cache_key] = result
+        _results.move_to_end(cache_key)
+        while len(_results) > MAX_CACHED_RESULTS:
+            _results.popitem(last=False)
+    return result
+
+
+def step_points(curves, by):
+    # Points utiles au tracé en escalier : délais avec incident et dernier
+    # délai observé de chaque cohorte
+    if len(curves) == 0:
+        return curves
+    if by:
+        last = (curves.groupby(by, observed=True, sort=False, dropna=False).cumcount(ascending=False) == 0).to_numpy()
+    else:
+        last = np.arange(len(curves)) == len(curves) - 1
+    return curves[(curves['incidents'].to_numpy() > 0) | last]
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Générateur de parcs synthétiques
+# -----------------------------
+# Produit un DataFrame ayant la forme d'une extraction Excel brute (avant
+# process_data), reproductible à graine fixe : répartition inégale des
+# modèles et filiales, numéros de série encodant le mois de fabrication,
+# dates cohérentes entre elles et nombre d'incidents très asymétrique.
+
+MODELS = ['V01', 'V01KB', 'VRS', 'V02', 'V02KB', 'VRS2', 'V03', 'VX10']
+COUNTRIES = [
+    'France', 'Germany', 'Spain', 'Italy', 'Belgium', 'Netherlands', 'Portugal',
+    'Switzerland', 'Austria', 'Poland', 'Sweden', 'Morocco', 'Tunisia', 'Algeria',
+    'Canada', 'United States', 'Brazil', 'Japan', 'India', 'Australia',
+]
+# Part des numéros de série volontairement illisibles
+MALFORMED_FRACTION = 0.001
+
+
+def _zipf_weights(n, exponent=1.2):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def generate_fleet(n_rows, seed=0, start='2016-01-01', end='2024-12-31'):
+    rng = np.random.default_rng(seed)
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+
+    models = rng.choice(MODELS, size=n_rows, p=_zipf_weights(len(MODELS)))
+    countries = rng.choice(COUNTRIES, size=n_rows, p=_zipf_weights(len(COUNTRIES), 0.9))
+
+    # Fabrication au mois près, encodée en tête du numéro de série (MMAA)
+    n_months = (end.year - start.year) * 12 + end.month - start.month + 1
+    month_offsets = rng.integers(0, n_months, size=n_rows)
+    fabrication = (np.datetime64(start, 'M') + month_offsets).astype('datetime64[D]')
+    months = pd.date_range(start, periods=n_months, freq='MS')
+    prefixes = np.array([f"{d.month:02d}{d.year % 100:02d}" for d in months], dtype=object)
+    serials = (
+        pd.Series(prefixes[month_offsets])
+        + pd.Series(models).str[:2]
+        + pd.Series(np.arange(n_rows)).astype(str).str.zfill(8)
+    )
+    malformed = rng.random(n_rows) < MALFORMED_FRACTION
+    serials[malformed] = 'XX' + serials[malformed].str[2:]
+
+    installation = fabrication + rng.integers(15, 240, size=n_rows).astype('timedelta64[D]')
+    last_seen = installation + rng.integers(30, 2000, size=n_rows).astype('timedelta64[D]')
+
+    # Incidents : binomiale négative (beaucoup de zéros, longue traîne)
+    incidents = rng.negative_binomial(0.6, 0.35, size=n_rows)
+    returns = rng.binomial(incidents, 0.2)
+    delay = rng.gamma(1.5, 220, size=n_rows).astype('int64').astype('timedelta64[D]')
+    first_incident = np.where(incidents > 0, installation + delay, np.datetime64('NaT'))
+    first_incident = np.minimum(first_incident, last_seen)
+
+    return pd.DataFrame({
+        'modèle': models,
+        'no de série': serials.to_numpy(dtype=object),
+        'filiale': countries,
+        "date d'installation": installation,
+        'dernière connexion': last_seen,
+        'Première date incident': first_incident,
+        'nombre_incidents': incidents,
+        'nombre_retours': returns,
+    })
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from charts import box_figure, box_summary
+
+
+def _check_empty(df):
+    summary, outliers = box_summary(df, 'modèle', 'délai')
+    assert summary.empty and outliers.empty
+    assert {'modèle', 'q1', 'median', 'q3', 'lowerfence', 'upperfence'} <= set(summary.columns)
+    box_figure(summary, outliers, 'modèle', 'délai')
+
+
+def test_box_summary_without_rows():
+    _check_empty(pd.DataFrame({'modèle': pd.Series([], dtype='category'), 'délai': pd.Series([], dtype='float64')}))
+
+
+def test_box_summary_with_only_missing_values():
+    _check_empty(pd.DataFrame({'modèle': ['V01', 'V02'], 'délai': [np.nan, np.nan]}))
+
+
+def test_box_summary_quartiles():
+    df = pd.DataFrame({'modèle': ['V01'] * 5, 'délai': [1, 2, 3, 4, 100]})
+    summary, outliers = box_summary(df, 'modèle', 'délai')
+    assert summary[['q1', 'median', 'q3']].iloc[0].tolist() == [2, 3, 4]
+    assert summary['upperfence'].iloc[0] == 4
+    assert outliers['délai'].tolist() == [100]
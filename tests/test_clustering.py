@@ -0,0 +1,31 @@
+import numpy as np
+
+from clustering import ClusteringModel, sweep_k
+
+
+def test_sweep_k_with_fewer_texts_than_k():
+    vectors = np.array([[0.0, 1.0], [1.0, 0.0]])
+    scores, k, model = sweep_k(vectors, range(2, 11), n_jobs=1)
+    assert k == 2
+    assert scores["k"].tolist() == [2]
+    assert np.isnan(scores["Silhouette"]).all()
+    assert len(model.labels_) == 2
+
+
+def test_sweep_k_without_any_silhouette():
+    # Textes identiques : un seul groupe pour chaque k, aucun score défini
+    vectors = np.ones((6, 2))
+    scores, k, model = sweep_k(vectors, range(2, 5), n_jobs=1)
+    assert np.isnan(scores["Silhouette"]).all()
+    assert k == 2
+    assert len(model.labels_) == 6
+
+
+def test_fit_with_fewer_texts_than_clusters():
+    model = ClusteringModel({
+        'vec_method': "TF-IDF", 'min_df': 1, 'max_features': None, 'dim_method': "PCA",
+        'clust_method': "KMeans", 'n_clusters': 3, 'large': False, 'k_range': None,
+    })
+    labels, coords = model.fit(["panne moteur"], weights=np.array([6]))
+    assert labels.tolist() == [0]
+    assert coords.shape == (1, 2)
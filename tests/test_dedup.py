@@ -0,0 +1,24 @@
+import numpy as np
+
+from dedup import collapse_near_duplicates, near_duplicate_groups
+
+
+def test_identical_empty_texts_are_grouped():
+    groups = near_duplicate_groups(["", "panne écran", "", "panne écran", "  ", "  "])
+    assert groups.tolist() == [0, 1, 0, 1, 2, 2]
+
+
+def test_short_texts_do_not_depend_on_their_neighbours():
+    first = near_duplicate_groups(["", "abcdefgh"])
+    second = near_duplicate_groups(["", "zyxwvuts"])
+    together = near_duplicate_groups(["", "abcdefgh", "", "zyxwvuts"])
+    assert first.tolist() == second.tolist() == [0, 1]
+    assert together.tolist() == [0, 1, 0, 2]
+
+
+def test_collapse_weights():
+    texts = ["le moteur ne démarre plus"] * 3 + ["fuite d'huile sous le véhicule"]
+    representatives, groups, weights = collapse_near_duplicates(texts)
+    assert representatives.tolist() == [0, 3]
+    assert groups.tolist() == [0, 0, 0, 1]
+    assert np.array_equal(weights, [3, 1])
@@ -0,0 +1,38 @@
+import numpy as np
+
+import embeddings
+from embeddings import EmbeddingStore, encode_texts
+
+
+class FakeEncoder:
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, batch_size=None, convert_to_numpy=True):
+        self.calls += 1
+        return np.array([[len(text), text.count('a')] for text in texts], dtype=np.float32)
+
+
+def _setup(monkeypatch, tmp_path):
+    store = EmbeddingStore("fake", directory=str(tmp_path))
+    encoder = FakeEncoder()
+    monkeypatch.setattr(embeddings, '_stores', {"fake": store})
+    monkeypatch.setattr(embeddings, 'get_sbert', lambda name: encoder)
+    return store, encoder
+
+
+def test_queries_are_not_stored(monkeypatch, tmp_path):
+    store, _ = _setup(monkeypatch, tmp_path)
+    encode_texts(["panne", "fuite"], model_name="fake")
+    assert len(store) == 2
+
+    vectors = encode_texts(["fuite", "ras", "panne", "ras"], model_name="fake", store=False)
+    assert len(store) == 2
+    assert vectors.tolist() == [[5, 0], [3, 1], [5, 1], [3, 1]]
+
+
+def test_stored_texts_are_not_encoded_again(monkeypatch, tmp_path):
+    store, encoder = _setup(monkeypatch, tmp_path)
+    encode_texts(["panne"], model_name="fake")
+    encode_texts(["panne"], model_name="fake", store=False)
+    assert encoder.calls == 1
@@ -0,0 +1,47 @@
+import io
+
+import pandas as pd
+import pytest
+
+import fleet_store
+import ingestion
+from filters import engine_for
+from pipeline import process_data
+
+
+@pytest.fixture(autouse=True)
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion, 'CACHE_DIR', str(tmp_path / 'ingestion'))
+    monkeypatch.setattr(fleet_store, 'STORE_DIR', str(tmp_path / 'store'))
+    monkeypatch.setattr(fleet_store, '_current', None)
+
+
+def _extract(prefix, n=50, incidents=0):
+    df = pd.DataFrame({
+        'modèle': ['V01'] * n,
+        'no de série': [f"{prefix}{i:06d}" for i in range(n)],
+        'filiale': ['France'] * n,
+        "date d'installation": pd.Timestamp('2020-01-01'),
+        'nombre_incidents': incidents,
+        'nombre_retours': 0,
+    })
+    data = io.BytesIO()
+    df.to_excel(data, index=False)
+    return data.getvalue()
+
+
+def test_upsert_counts():
+    fleet_store.merge_extract(_extract('AA'), process_data)
+    df, report = fleet_store.merge_extract(_extract('AA', n=60, incidents=1), process_data)
+    assert (report['nouveaux'], report['modifiés'], report['inchangés']) == (10, 50, 0)
+    assert len(df) == 60 and df['nombre_incidents'].sum() == 60
+
+
+def test_cleared_store_does_not_reuse_sidecars():
+    first, _ = fleet_store.merge_extract(_extract('AA'), process_data)
+    assert len(engine_for(first).text_indexes['no de série'].search('AA0')) == 50
+    fleet_store.clear_store()
+
+    second, _ = fleet_store.merge_extract(_extract('BB'), process_data)
+    assert second.attrs['cache_key'] != first.attrs['cache_key']
+    assert len(engine_for(second).text_indexes['no de série'].search('BB0')) == 50
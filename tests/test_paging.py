@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from paging import page, sort_keys
+
+
+@pytest.mark.parametrize('ascending', [True, False])
+def test_sort_float_column_with_nan(ascending):
+    values = pd.Series([3.5, np.nan, 1.0, 2.0, np.nan])
+    df = pd.DataFrame({'délai_premier_incident': values})
+    result = page(df, ('float', ascending), 'délai_premier_incident', ascending, 0, 10)
+    expected = [1.0, 2.0, 3.5] if ascending else [3.5, 2.0, 1.0]
+    assert result['délai_premier_incident'].tolist()[:3] == expected
+    # Valeurs manquantes toujours en fin de tableau
+    assert result['délai_premier_incident'].isna().tolist() == [False] * 3 + [True] * 2
+    # Le DataFrame d'origine n'est pas modifié
+    assert values.isna().sum() == 2
+
+
+def test_sort_keys_does_not_write_into_series():
+    series = pd.Series([1.0, np.nan])
+    keys = sort_keys(series, ascending=True)
+    assert keys[1] == np.inf
+    assert np.isnan(series.iloc[1])
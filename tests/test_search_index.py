@@ -0,0 +1,13 @@
+import numpy as np
+import pandas as pd
+
+from search_index import NgramIndex
+
+
+def test_extend_matches_a_full_build():
+    values = pd.Series(['AB0119X', 'cd0456', None, 'x1', 'Ab0119Y', 'zz0119'], dtype='string')
+    extended = NgramIndex(values.iloc[:3]).extend(values)
+    full = NgramIndex(values)
+    assert extended.lower.tolist() == full.lower.tolist()
+    for query in ['0119', 'ab01*', 'x', 'ab, zz', '0119 y']:
+        assert np.array_equal(extended.search(query), full.search(query)), query
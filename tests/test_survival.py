@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from survival import durations, kaplan_meier
+
+
+def _fleet():
+    return pd.DataFrame({
+        'modèle': pd.Categorical(['A', 'A', 'A', 'B', 'B']),
+        'Date de fabrication': pd.to_datetime(['2020-01-05', '2020-01-20', None, '2020-02-01', '2020-02-03']),
+        "date d'installation": pd.to_datetime(['2020-02-01', None, '2020-03-01', '2020-03-01', '2020-03-01']),
+        'dernière connexion': pd.to_datetime(['2021-02-01', '2021-01-01', '2021-03-01', None, '2020-12-01']),
+        'Première date incident': pd.to_datetime(['2020-06-01', None, None, None, None]),
+    })
+
+
+def test_durations_with_missing_dates():
+    days, event = durations(_fleet())
+    assert event.tolist() == [True, False, False, False, False]
+    assert np.isnan(days[1]) and np.isnan(days[3])
+    assert days[0] == 121
+
+
+def test_durations_inconsistent_dates_are_dropped():
+    df = _fleet()
+    df.loc[4, 'dernière connexion'] = pd.Timestamp('2019-01-01')
+    days, _ = durations(df)
+    assert np.isnan(days[4])
+
+
+def test_kaplan_meier_with_missing_dates():
+    curves, cohorts = kaplan_meier(_fleet())
+    # Ligne 1 (installation inconnue), 2 (fabrication inconnue) et 3 (ni
+    # incident ni dernière connexion) écartées
+    assert cohorts['produits'].tolist() == [1, 1]
+    assert cohorts['incidents'].tolist() == [1, 0]
+    assert curves['survie'].tolist() == [0.0, 1.0]